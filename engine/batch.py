@@ -0,0 +1,136 @@
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from glob import glob
+from logging import getLogger
+from pathlib import Path
+from time import perf_counter
+from typing import Any, List, Optional, Sequence
+
+from engine.log import LOGGER_NAME
+logger = getLogger(LOGGER_NAME)
+
+from engine.cache import OutputCache
+from engine.errors import YovecError
+from engine.run import stream_yovec
+
+
+Result = namedtuple('Result', ('infile', 'outfile', 'error', 'seconds'))
+
+
+def expand_inputs(patterns: Sequence[str], manifest: Optional[str]=None) -> List[Path]:
+    """Expand glob patterns and manifest entries to a list of input files.
+
+    Manifest entries are relative to the manifest, one per line.
+    Blank lines and lines starting with # are ignored.
+    A pattern that matches nothing is kept as a path, so that it fails on its own when transpiled
+    instead of aborting the batch.
+    """
+    patterns = list(patterns)
+    if manifest is not None:
+        base = Path(manifest).parent
+        try:
+            with open(manifest) as f:
+                lines = [line.strip() for line in f]
+        except IOError as e:
+            raise YovecError('unable to read manifest {}: {}'.format(manifest, str(e)))
+        patterns.extend(str(base / line) for line in lines if line and not line.startswith('#'))
+
+    inputs = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob(pattern, recursive=True))
+        if len(matches) == 0:
+            logger.debug('no input files match - {}'.format(pattern))
+            matches = [pattern]
+        for match in matches:
+            path = Path(match)
+            if path.resolve() not in seen:
+                seen.add(path.resolve())
+                inputs.append(path)
+    return inputs
+
+
+def output_path(infile: Path, outdir: Path, ast: bool, cylon: bool, flat: bool) -> Path:
+    """Get the output path of an input file."""
+    if flat:
+        suffix = '.ast.json'
+    elif ast:
+        suffix = '.ast'
+    elif cylon:
+        suffix = '.json'
+    else:
+        suffix = '.yolol'
+    return outdir / infile.with_suffix(suffix).name
+
+
+def transpile_file(infile: Path, outfile: Path, root: str, cache: Optional[OutputCache]=None, **flags: Any) -> Result:
+    """Transpile a single file, capturing errors and timing in the result.
+
+    Unexpected exceptions are captured too, so that one file cannot abort the batch.
+    """
+    logger.debug('transpiling file - {}'.format(infile))
+    start = perf_counter()
+    try:
+        with open(str(infile)) as f:
+            source = f.read()
+    except IOError as e:
+        return Result(infile, outfile, 'Input error: {}'.format(str(e)), perf_counter() - start)
+
+    try:
+        chunks = stream_yovec(source, root=root, cache=cache, **flags)
+    except YovecError as e:
+        return Result(infile, outfile, str(e), perf_counter() - start)
+    except Exception as e:
+        return Result(infile, outfile, 'Internal error: {}'.format(str(e)), perf_counter() - start)
+
+    try:
+        with open(str(outfile), 'w') as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.write('\n')
+    except IOError as e:
+        return Result(infile, outfile, 'Output error: {}'.format(str(e)), perf_counter() - start)
+    except Exception as e:
+        return Result(infile, outfile, 'Internal error: {}'.format(str(e)), perf_counter() - start)
+    return Result(infile, outfile, None, perf_counter() - start)
+
+
+def run_batch(inputs: Sequence[Path], outdir: Path, root: str, jobs: int=1, cache: Optional[OutputCache]=None,
+        **flags: Any) -> List[Result]:
+    """Transpile many files, optionally across a pool of worker processes.
+
+    Each process builds its parser on its first file, then shares it and its library cache between files.
+    Errors are reported per file and do not abort the batch.
+    Results are returned in the same order as the inputs.
+    """
+    outfiles = [output_path(infile, outdir, flags['ast'], flags['cylon'], flags['flat']) for infile in inputs]
+    duplicates = {str(p) for p, count in Counter(outfiles).items() if count > 1}
+    if len(duplicates) > 0:
+        raise YovecError('multiple inputs map to the same output: {}'.format(sorted(duplicates)))
+    try:
+        outdir.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        raise YovecError('unable to create output directory {}: {}'.format(outdir, str(e)))
+    transpile = partial(transpile_file, root=root, cache=cache, **flags)
+    if jobs <= 1 or len(inputs) <= 1:
+        return [transpile(infile, outfile) for infile, outfile in zip(inputs, outfiles)]
+    logger.debug('transpiling {} files with {} jobs'.format(len(inputs), jobs))
+    chunksize = max(1, len(inputs) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(transpile, inputs, outfiles, chunksize=chunksize))
+
+
+def summarize(results: Sequence[Result], slowest: int=5) -> str:
+    """Summarize the outcome and per-file timings of a batch."""
+    failed = [r for r in results if r.error is not None]
+    total = sum(r.seconds for r in results)
+    lines = ['Transpiled {} of {} files ({:.3f}s total, {:.3f}s mean)'.format(
+        len(results) - len(failed),
+        len(results),
+        total,
+        total / len(results) if len(results) > 0 else 0
+    )]
+    for r in sorted(results, key=lambda r: r.seconds, reverse=True)[:slowest]:
+        lines.append('  {:.3f}s  {}'.format(r.seconds, r.infile))
+    return '\n'.join(lines)
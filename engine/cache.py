@@ -0,0 +1,112 @@
+import json
+import os
+import re
+from hashlib import sha256
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from engine.log import LOGGER_NAME
+logger = getLogger(LOGGER_NAME)
+
+from engine.errors import YovecError
+from engine.version import VERSION
+
+from engine.transpile.library import find_library
+
+
+USING = re.compile(r'\busing\s+([a-zA-Z0-9_]+)')
+
+
+class OutputCache:
+    """Store transpiled outputs on disk, keyed by a hash of their inputs.
+
+    The least recently used outputs are evicted when the cache exceeds a fraction of its size.
+    The directory is scanned on the first store, then again once this process has stored its share
+    of the remaining room, so a full cache is not scanned on every store. Processes that share the
+    directory each store their share of the room between scans, so the cache stays within its size.
+    """
+    # Fraction of the maximum size that eviction leaves the cache at
+    LOW_WATER = 0.9
+
+    def __init__(self, directory: str, max_bytes: int, processes: int=1):
+        logger.debug('creating output cache - {}'.format(directory))
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.processes = processes
+        self._stored = None # type: Optional[int]
+
+    def key(self, source: str, root: str, options: Dict[str, Any]) -> str:
+        """Hash the source, the libraries it uses, the options and the version."""
+        digest = sha256()
+        digest.update(VERSION.encode('utf-8'))
+        digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+        digest.update(source.encode('utf-8'))
+        for ident in sorted(set(USING.findall(source))):
+            digest.update('\0{}\0'.format(ident).encode('utf-8'))
+            try:
+                with open(str(find_library(ident, root))) as f:
+                    digest.update(f.read().encode('utf-8'))
+            except (YovecError, IOError):
+                # Missing libraries fail transpilation, so nothing is stored
+                pass
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a stored output, marking it as recently used."""
+        path = self.directory / key
+        try:
+            with open(str(path)) as f:
+                output = f.read()
+            os.utime(str(path))
+        except OSError:
+            return None
+        logger.debug('cache hit - {}'.format(key))
+        return output
+
+    def put(self, key: str, output: str):
+        """Store an output, then evict old outputs if the cache is too large."""
+        logger.debug('cache store - {}'.format(key))
+        path = self.directory / key
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            try:
+                replaced = path.stat().st_size
+            except OSError:
+                replaced = 0
+            temp = self.directory / '{}.{}.tmp'.format(key, os.getpid())
+            with open(str(temp), 'w') as f:
+                f.write(output)
+            size = temp.stat().st_size
+            os.replace(str(temp), str(path))
+        except OSError as e:
+            logger.debug('failed to store cached output - {}'.format(str(e)))
+            return
+        if self._stored is not None:
+            self._stored += max(0, size - replaced)
+        if self._stored is None or self._stored > self.max_bytes * (1 - self.LOW_WATER) / self.processes:
+            self.evict()
+
+    def evict(self):
+        """Evict the least recently used outputs until the cache leaves room for more outputs."""
+        entries = []
+        for path in self.directory.iterdir():
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes * self.LOW_WATER:
+            for _, size, path in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes * self.LOW_WATER:
+                    break
+                logger.debug('cache evict - {}'.format(path.name))
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                total -= size
+        self._stored = 0
@@ -8,6 +8,11 @@ class Context:
     statement = None
     expression = None
 
+    @classmethod
+    def reset(cls):
+        cls.statement = None
+        cls.expression = None
+
     @classmethod
     def format(cls):
         return '{}{}'.format(
@@ -58,6 +58,22 @@ class Env:
             raise YovecError('cannot redefine existing variable: {}'.format(ident))
         elif ident in self.macros:
             raise YovecError('conflict between macro and variable: {}'.format(ident))
+        clone = deepcopy(self)
+        index = clone._next_index(value)
+        assignments, value = value.assign(index)
+        clone._variables[ident] = (value, index)
+        return clone, assignments
+
+    def temp(self, value: Value) -> Tuple['Env', List[Node], Value]:
+        """Assign a value to temporary variables, which are not bound to an identifier."""
+        logger.debug('assigning temporary')
+        clone = deepcopy(self)
+        index = clone._next_index(value)
+        assignments, value = value.assign(index)
+        return clone, assignments, value
+
+    def _next_index(self, value: Value) -> int:
+        """Take the next index for a value of some type."""
         if type(value) == Number:
             index = self._num_index
             self._num_index += 1
@@ -69,10 +85,7 @@ class Env:
             self._mat_index += 1
         else:
             raise AssertionError('unexpected value type: {}'.format(type(value)))
-        assignments, value = value.assign(index)
-        clone = deepcopy(self)
-        clone._variables[ident] = (value, index)
-        return clone, assignments
+        return index
 
     def macro(self, ident: str) -> Macro:
         """Get a macro."""
@@ -1,28 +1,125 @@
 import json
 from logging import getLogger
-from typing import Any
+from typing import Any, Iterator, List, Union
 
 from engine.log import LOGGER_NAME
 logger = getLogger(LOGGER_NAME)
 
 from engine.grammar import OPERATORS
 from engine.node import Node
+from engine.parallel import map_nodes
 
 
-def yolol_to_cylon(program: Node) -> str:
+VERSION = '0.3.0'
+INDENT = 4
+SEPARATORS = (',', ':')
+
+# Every expression has the same metadata, so a single object is shared
+METADATA = {'type': {'version': '1.0.0', 'types': ['number', 'error']}}
+
+
+def yolol_to_cylon(program: Node, jobs: int=1) -> str:
     """Format a YOLOL program as Cylon JSON."""
-    assert program.kind == 'program'
-    root = {'version': '0.3.0', 'program': _format_program(program)}
-    return json.dumps(root, indent=4)
+    return ''.join(iter_cylon(program, jobs=jobs))
+
 
+def iter_cylon(program: Node, jobs: int=1) -> Iterator[str]:
+    """Format a YOLOL program as Cylon JSON, one line object at a time.
 
-def _format_program(program: Node) -> Any:
-    """Format a program."""
+    The output is identical to dumping the whole document at once.
+    If there are multiple jobs, lines are formatted in parallel.
+    """
     assert program.kind == 'program'
-    if program.children is None:
-        return {'type': 'program', 'lines': []}
+    yield '{{\n{0}"version": {1},\n{0}"program": {{\n{0}{0}"type": "program",\n{0}{0}"lines": '.format(
+        ' ' * INDENT,
+        json.dumps(VERSION)
+    )
+    if program.children is None or len(program.children) == 0:
+        yield '[]'
     else:
-        return {'type': 'program', 'lines': [_format_line(line) for line in program.children]}
+        margin = '\n' + ' ' * (INDENT * 3)
+        for i, formatted in enumerate(map_nodes(_dump_line, program.children, jobs)):
+            yield ('[' if i == 0 else ',') + margin + formatted.replace('\n', margin)
+        yield '\n{}]'.format(' ' * (INDENT * 2))
+    yield '\n{}}}\n}}'.format(' ' * INDENT)
+
+
+def iter_compact_cylon(program: Node, jobs: int=1) -> Iterator[str]:
+    """Format a YOLOL program as minified Cylon JSON, one line object at a time.
+
+    Lines are encoded directly from the AST, without building an intermediate tree.
+    If there are multiple jobs, lines are encoded in parallel.
+    """
+    assert program.kind == 'program'
+    yield '{{"version":{},"program":{{"type":"program","lines":['.format(json.dumps(VERSION))
+    if program.children is not None:
+        for i, encoded in enumerate(map_nodes(_encode_compact_line, program.children, jobs)):
+            yield encoded if i == 0 else ',' + encoded
+    yield ']}}'
+
+
+def _dump_line(line: Node) -> str:
+    """Format a line as indented JSON."""
+    return json.dumps(_format_line(line), indent=INDENT)
+
+
+def _encode_compact_line(line: Node) -> str:
+    """Format a line as minified JSON."""
+    tokens = [] # type: List[str]
+    _encode_line(line, tokens)
+    return ''.join(tokens)
+
+
+_METADATA_JSON = json.dumps(METADATA, separators=SEPARATORS)
+_OPERATOR_JSON = {kind: json.dumps(op, separators=SEPARATORS) for kind, op in OPERATORS.items()}
+
+
+def _encode_line(line: Node, tokens: List[str]):
+    """Encode a line as minified JSON."""
+    assert line.kind == 'line'
+    logger.debug('encoding line - {}'.format(line))
+    tokens.append('{"type":"line","code":[')
+    for i, asn in enumerate(line.children):
+        assert asn.kind == 'assignment'
+        if i > 0:
+            tokens.append(',')
+        tokens.append('{{"type":"statement::assignment","identifier":{},"operator":"=","value":'.format(
+            json.dumps(asn.children[0].value)
+        ))
+        _encode_expression(asn.children[1], tokens)
+        tokens.append('}')
+    tokens.append(']}')
+
+
+def _encode_expression(expr: Node, tokens: List[str]):
+    """Encode an expression as minified JSON, using an explicit stack."""
+    stack = [expr] # type: List[Union[Node, str]]
+    while len(stack) > 0:
+        item = stack.pop()
+        if isinstance(item, str):
+            tokens.append(item)
+        elif item.kind == 'variable':
+            tokens.append('{{"type":"expression::identifier","name":{},"metadata":{}}}'.format(
+                json.dumps(item.value),
+                _METADATA_JSON
+            ))
+        elif item.kind == 'number':
+            tokens.append('{{"type":"expression::number","num":{},"metadata":{}}}'.format(
+                json.dumps(str(item.value)),
+                _METADATA_JSON
+            ))
+        elif len(item.children) == 1:
+            tokens.append('{{"type":"expression::unary_op","operator":{},"operand":'.format(_OPERATOR_JSON[item.kind]))
+            stack.append(',"metadata":{}}}'.format(_METADATA_JSON))
+            stack.append(item.children[0])
+        elif len(item.children) == 2:
+            tokens.append('{{"type":"expression::binary_op","operator":{},"left":'.format(_OPERATOR_JSON[item.kind]))
+            stack.append(',"metadata":{}}}'.format(_METADATA_JSON))
+            stack.append(item.children[1])
+            stack.append(',"right":')
+            stack.append(item.children[0])
+        else:
+            raise AssertionError('unexpected expression: {}'.format(item))
 
 
 def _format_line(line: Node) -> Any:
@@ -45,7 +142,7 @@ def _format_assignment(assignment: Node) -> Any:
 def _format_expression(expr: Node) -> Any:
     """Format an expression."""
     logger.debug('formatting expression - {}'.format(expr))
-    metadata = {'type': {'version': '1.0.0', 'types': ['number', 'error']}}
+    metadata = METADATA
     if expr.kind == 'variable':
         return {'type': 'expression::identifier', 'name': expr.value, 'metadata': metadata}
     elif expr.kind == 'number':
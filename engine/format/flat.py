@@ -0,0 +1,112 @@
+import json
+from logging import getLogger
+from typing import Any, Dict, Iterator, List
+
+from engine.log import LOGGER_NAME
+logger = getLogger(LOGGER_NAME)
+
+from engine.errors import YovecError
+from engine.node import Node
+
+
+FORMAT = 'yovec-flat-ast'
+VERSION = 1
+
+# Number of nodes per output chunk
+CHUNK_SIZE = 1024
+
+
+def yolol_to_flat(program: Node) -> str:
+    """Format a YOLOL program as a flat AST."""
+    return ''.join(iter_flat(program))
+
+
+def iter_flat(program: Node) -> Iterator[str]:
+    """Format a YOLOL program as a flat AST, in chunks of nodes.
+
+    The flat AST is a JSON object. Its nodes are a single array holding the kind index,
+    value and child count of each node in preorder. A child count of -1 means that the node has no children list.
+    Kinds are stored once, in a table that follows the nodes.
+    """
+    assert program.kind == 'program'
+    logger.debug('formatting flat AST')
+    return _iter_nodes(program)
+
+
+def node_to_flat(node: Node) -> str:
+    """Format any node as a flat AST."""
+    return ''.join(_iter_nodes(node))
+
+
+def _iter_nodes(node: Node) -> Iterator[str]:
+    """Format a node and its descendants as a flat AST, in chunks of nodes."""
+    yield '{{"format":{},"version":{},"nodes":['.format(json.dumps(FORMAT), VERSION)
+    kinds = {} # type: Dict[str, int]
+    chunk = [] # type: List[Any]
+    first = True
+    stack = [node]
+    while len(stack) > 0:
+        node = stack.pop()
+        if node.kind not in kinds:
+            kinds[node.kind] = len(kinds) # type: ignore
+        if node.children is None:
+            chunk.extend((kinds[node.kind], node.value, -1)) # type: ignore
+        else:
+            chunk.extend((kinds[node.kind], node.value, len(node.children))) # type: ignore
+            stack.extend(reversed(node.children))
+        if len(chunk) >= CHUNK_SIZE * 3:
+            yield ('' if first else ',') + json.dumps(chunk, separators=(',', ':'))[1:-1]
+            first = False
+            chunk = []
+    if len(chunk) > 0:
+        yield ('' if first else ',') + json.dumps(chunk, separators=(',', ':'))[1:-1]
+    yield '],"kinds":{}}}'.format(json.dumps(list(kinds), separators=(',', ':')))
+
+
+def flat_to_yolol(text: str) -> Node:
+    """Load a YOLOL program from a flat AST."""
+    program = flat_to_node(text)
+    if program.kind != 'program':
+        raise YovecError('invalid flat AST: expected program, but got {}'.format(program.kind))
+    return program
+
+
+def flat_to_node(text: str) -> Node:
+    """Load any node from a flat AST."""
+    try:
+        document = json.loads(text)
+        if document['format'] != FORMAT or document['version'] != VERSION:
+            raise YovecError('unsupported flat AST: {} version {}'.format(document['format'], document['version']))
+        kinds = document['kinds']
+        nodes = document['nodes']
+    except (ValueError, TypeError, KeyError) as e:
+        raise YovecError('invalid flat AST: {}'.format(str(e)))
+    if type(nodes) != list or len(nodes) == 0 or len(nodes) % 3 != 0:
+        raise YovecError('invalid flat AST: expected nodes to be triples')
+
+    root = None
+    # Each entry holds a parent and the number of children it is still waiting for
+    stack = [] # type: List[Any]
+    for i in range(0, len(nodes), 3):
+        kind, value, count = nodes[i:i+3]
+        if type(count) != int or count < -1:
+            raise YovecError('invalid flat AST: invalid child count: {}'.format(count))
+        try:
+            node = Node(kind=kinds[kind], value=value, children=[] if count == 0 else None)
+        except (IndexError, TypeError):
+            raise YovecError('invalid flat AST: unknown kind index: {}'.format(kind))
+        if len(stack) > 0:
+            parent = stack[-1]
+            parent[0].append_child(node)
+            parent[1] -= 1
+            if parent[1] == 0:
+                stack.pop()
+        elif root is None:
+            root = node
+        else:
+            raise YovecError('invalid flat AST: multiple roots')
+        if count > 0:
+            stack.append([node, count])
+    if len(stack) > 0:
+        raise YovecError('invalid flat AST: missing nodes')
+    return root # type: ignore
@@ -1,36 +1,67 @@
-from collections import namedtuple
 from logging import getLogger
 from sys import stderr
-from typing import Optional
+from typing import Iterator, List
 
 from engine.log import LOGGER_NAME
 logger = getLogger(LOGGER_NAME)
 
-from engine.grammar import Operator, OPERATORS
+from engine.grammar import OPERATORS
 from engine.node import Node
+from engine.parallel import map_nodes
 
 
-def yolol_to_text(program: Node) -> str:
+LINE_LIMIT = 70
+
+
+def yolol_to_text(program: Node, jobs: int=1) -> str:
     """Format a YOLOL program as text."""
+    return ''.join(iter_text(program, jobs=jobs))
+
+
+def iter_text(program: Node, jobs: int=1) -> Iterator[str]:
+    """Format a YOLOL program as text, one line at a time.
+
+    Every line but the first is preceded by a newline.
+    If there are multiple jobs, assignments are formatted in parallel.
+    """
     assert program.kind == 'program'
-    assignments = program.find(lambda node: node.kind == 'assignment')
-    formatted = [_format_assignment(a) for a in assignments]
-    text = ''
-    curr = []
+    first = True
+    for line in _pack_lines(program, jobs):
+        if first and len(line) == 0:
+            # Skip leading empty lines
+            continue
+        yield line if first else '\n' + line
+        first = False
+
+
+def _pack_lines(program: Node, jobs: int) -> Iterator[str]:
+    """Pack formatted assignments into lines."""
+    lines = program.children if program.children is not None else []
+    formatted = (f for fs in map_nodes(_format_line, lines, jobs) for f in fs)
+    curr = [] # type: List[str]
+    width = 0
     for f in formatted:
-        line = ' '.join(curr)
-        if len(f) > 70:
-            stderr.write('Warning: line exceeds 70 characters\n')
-            text += '{}\n{}\n'.format(line, f)
+        if len(f) > LINE_LIMIT:
+            stderr.write('Warning: line exceeds {} characters\n'.format(LINE_LIMIT))
+            yield ' '.join(curr)
+            yield f
             curr = []
-        elif len(line) + len(' ') + len(f) > 70:
-            text += '{}\n'.format(line)
+            width = 0
+        elif width + len(' ') + len(f) > LINE_LIMIT:
+            yield ' '.join(curr)
             curr = [f]
+            width = len(f)
         else:
+            width += len(f) + (len(' ') if len(curr) > 0 else 0)
             curr.append(f)
     if len(curr) > 0:
-        text += '{}\n'.format(' '.join(curr))
-    return text.strip('\n')
+        yield ' '.join(curr)
+
+
+def _format_line(line: Node) -> List[str]:
+    """Format the assignments of a line."""
+    assert line.kind == 'line'
+    return [_format_assignment(asn) for asn in line.children]
 
 
 def _format_assignment(assignment: Node) -> str:
@@ -38,36 +69,55 @@ def _format_assignment(assignment: Node) -> str:
     assert assignment.kind == 'assignment'
     logger.debug('formatting assignment - {}'.format(assignment))
     variable = assignment.children[0].value
-    expr = _format_expr(assignment.children[1]).strip()
-    expr = expr.replace(' (', '(').replace('( ', '(')
-    expr = expr.replace(' )', ')').replace(') ', ')')
-    expr = expr.replace('  ', ' ')
-    return '{}={}'.format(variable, expr)
+    return '{}={}'.format(variable, format_expression(assignment.children[1]))
 
 
-def _format_expr(expr: Node, parent: Optional[Operator]=None) -> str:
+def format_expression(expr: Node) -> str:
     """Format an expression."""
-    logger.debug('formatting expression - {}'.format(expr))
-    if parent is None:
-        parent = Operator('NOOP', -1)
+    emitter = _Emitter()
+    _emit_expr(emitter, expr, -1)
+    return ''.join(emitter.tokens)
+
+
+class _Emitter:
+    """Write tokens, deciding on spacing as each token is written.
+
+    Alphabetic operators are separated from neighbouring tokens by a single space,
+    except where the neighbour is a parenthesis.
+    """
+    def __init__(self):
+        self.tokens = [] # type: List[str]
+        self.last = ''
+        self.spaced = False
+
+    def write(self, token: str, spaced: bool=False):
+        """Write a token."""
+        if len(self.tokens) > 0 and (spaced or self.spaced):
+            if token not in ('(', ')') and self.last not in ('(', ')'):
+                self.tokens.append(' ')
+        self.tokens.append(token)
+        self.last = token
+        self.spaced = spaced
+
+
+def _emit_expr(emitter: _Emitter, expr: Node, parent: int):
+    """Emit an expression, given the precedence of its parent."""
     if expr.children is None:
-        return str(expr.value)
-    elif len(expr.children) == 1:
-        op = OPERATORS[expr.kind] # type: ignore
-        return '{lparen}{sym}{child}{rparen}'.format(
-            lparen='(' if parent.precedence > op.precedence else '',
-            sym=' {} '.format(op.symbol) if op.symbol.isalpha() else op.symbol,
-            child=_format_expr(expr.children[0], op),
-            rparen=')' if parent.precedence > op.precedence else '',
-        )
+        emitter.write(str(expr.value))
+        return
+    op = OPERATORS[expr.kind] # type: ignore
+    paren = parent > op.precedence
+    if paren:
+        emitter.write('(')
+    if len(expr.children) == 1:
+        emitter.write(op.symbol, op.symbol.isalpha())
+        _emit_expr(emitter, expr.children[0], op.precedence)
     elif len(expr.children) == 2:
-        op = OPERATORS[expr.kind] # type: ignore
-        return '{lparen}{lchild}{sym}{rchild}{rparen}'.format(
-            lparen='(' if parent.precedence > op.precedence else '',
-            lchild=_format_expr(expr.children[0], op),
-            sym=' {} '.format(op.symbol) if op.symbol.isalpha() else op.symbol,
-            rchild=_format_expr(expr.children[1], op),
-            rparen=')' if parent.precedence > op.precedence else ''
-        )
+        _emit_expr(emitter, expr.children[0], op.precedence)
+        emitter.write(op.symbol, op.symbol.isalpha())
+        # Binary operators are left-associative, so the right operand binds tighter
+        _emit_expr(emitter, expr.children[1], op.precedence + 1)
     else:
         raise AssertionError('unexpected expression: {}'.format(expr))
+    if paren:
+        emitter.write(')')
@@ -0,0 +1,173 @@
+import re
+from collections import namedtuple
+from logging import getLogger
+from typing import Dict, List, Optional, Tuple
+
+from engine.log import LOGGER_NAME
+logger = getLogger(LOGGER_NAME)
+
+from engine.errors import YovecError
+from engine.grammar import OPERATORS
+from engine.node import Node
+
+from engine.format.text import LINE_LIMIT
+from engine.optimize.decimal import Decimal, UNARY
+
+
+TOKEN = re.compile(r'\s*(?:(\d+(?:\.\d+)?)|([a-zA-Z_][a-zA-Z0-9_]*)|(<=|>=|==|!=|[-+*/%^<>=()]))')
+
+_PREFIX = {op.symbol: kind for kind, op in OPERATORS.items() if kind in UNARY}
+_INFIX = {op.symbol: kind for kind, op in OPERATORS.items() if kind not in UNARY}
+
+
+Execution = namedtuple('Execution', ('variables', 'ticks', 'passes', 'errors'))
+
+
+def parse_yolol(text: str, check_length: bool=True) -> Node:
+    """Parse YOLOL text, as emitted by the text formatter, into a program.
+
+    Each line of text becomes a line of the program, including empty lines.
+    Lines longer than the YOLOL line limit are rejected, unless the check is disabled.
+    """
+    program = Node(kind='program', children=[])
+    for number, text_line in enumerate(text.split('\n'), start=1):
+        if check_length and len(text_line) > LINE_LIMIT:
+            raise YovecError('line {} exceeds {} characters'.format(number, LINE_LIMIT))
+        try:
+            program.append_child(_Parser(text_line).line())
+        except YovecError as e:
+            raise YovecError('line {}: {}'.format(number, str(e)))
+    return program
+
+
+def run_yolol(program: Node, ticks: int, externals: Optional[Dict[str, float]]=None) -> Execution:
+    """Execute a YOLOL program for a number of ticks.
+
+    One line is executed per tick, wrapping to the first line after the last.
+    Variables start with the values of the externals, or 0 if unset.
+    A runtime error skips the rest of its line, as in the game.
+    """
+    assert program.kind == 'program'
+    logger.debug('executing YOLOL program for {} ticks'.format(ticks))
+    variables = {name: Decimal(value) for name, value in (externals or {}).items()}
+    lines = program.children if program.children is not None else []
+    errors = 0
+    for tick in range(ticks if len(lines) > 0 else 0):
+        try:
+            for assignment in lines[tick % len(lines)].children:
+                variables[assignment.children[0].value] = _evaluate(assignment.children[1], variables)
+        except ArithmeticError as e:
+            logger.debug('runtime error on tick {} - {}'.format(tick + 1, str(e)))
+            errors += 1
+    values = {name: value.value for name, value in sorted(variables.items())}
+    passes = ticks // len(lines) if len(lines) > 0 else 0
+    return Execution(variables=values, ticks=ticks, passes=passes, errors=errors)
+
+
+def report(execution: Execution) -> str:
+    """Report the outcome of an execution."""
+    lines = ['ticks={} passes={} errors={}'.format(execution.ticks, execution.passes, execution.errors)]
+    for name, value in execution.variables.items():
+        lines.append('{}={}'.format(name, Decimal(value)))
+    return '\n'.join(lines)
+
+
+def _evaluate(expr: Node, variables: Dict[str, Decimal]) -> Decimal:
+    """Evaluate an expression."""
+    if expr.kind == 'number':
+        return Decimal(expr.value) # type: ignore
+    elif expr.kind == 'variable':
+        return variables.get(expr.value, Decimal(0)) # type: ignore
+    elif len(expr.children) == 1:
+        return _evaluate(expr.children[0], variables).unary(expr.kind) # type: ignore
+    elif len(expr.children) == 2:
+        left = _evaluate(expr.children[0], variables)
+        return left.binary(expr.kind, _evaluate(expr.children[1], variables)) # type: ignore
+    else:
+        raise AssertionError('unexpected expression: {}'.format(expr))
+
+
+class _Parser:
+    """Parse a line of YOLOL by precedence climbing.
+
+    Binary operators are left-associative, matching the parentheses of the text formatter.
+    """
+    def __init__(self, text: str):
+        self.tokens = self._tokenize(text)
+        self.index = 0
+
+    @staticmethod
+    def _tokenize(text: str) -> List[Tuple[str, str]]:
+        """Split text into (kind, token) pairs."""
+        tokens = []
+        position = 0
+        while position < len(text.rstrip()):
+            match = TOKEN.match(text, position)
+            if match is None:
+                raise YovecError('unexpected character: {}'.format(text[position:].strip()[0]))
+            number, name, symbol = match.groups()
+            if number is not None:
+                tokens.append(('number', number))
+            elif name is not None and name not in _PREFIX and name not in _INFIX:
+                tokens.append(('variable', name))
+            else:
+                tokens.append(('symbol', name or symbol))
+            position = match.end()
+        return tokens
+
+    def peek(self, offset: int=0) -> Optional[Tuple[str, str]]:
+        """Get an upcoming token without consuming it."""
+        if self.index + offset < len(self.tokens):
+            return self.tokens[self.index + offset]
+        return None
+
+    def take(self) -> Tuple[str, str]:
+        """Consume the next token."""
+        token = self.peek()
+        if token is None:
+            raise YovecError('unexpected end of line')
+        self.index += 1
+        return token
+
+    def line(self) -> Node:
+        """Parse a line of assignments."""
+        line = Node(kind='line', children=[])
+        while self.peek() is not None:
+            kind, name = self.take()
+            if kind != 'variable' or self.take() != ('symbol', '='):
+                raise YovecError('expected assignment')
+            line.append_child(Node(kind='assignment', children=[
+                Node(kind='variable', value=name),
+                self.expression(0)
+            ]))
+        return line
+
+    def expression(self, precedence: int) -> Node:
+        """Parse an expression whose binary operators bind at least as tightly as a precedence."""
+        left = self.operand()
+        while True:
+            token = self.peek()
+            if token is None or token[0] != 'symbol' or token[1] not in _INFIX:
+                return left
+            op = OPERATORS[_INFIX[token[1]]]
+            if op.precedence < precedence:
+                return left
+            self.take()
+            right = self.expression(op.precedence + 1)
+            left = Node(kind=_INFIX[token[1]], children=[left, right])
+
+    def operand(self) -> Node:
+        """Parse a number, variable, parenthesized expression or unary operation."""
+        kind, token = self.take()
+        if kind in ('number', 'variable'):
+            return Node(kind=kind, value=token)
+        elif token == '(':
+            expr = self.expression(0)
+            if self.take() != ('symbol', ')'):
+                raise YovecError('expected )')
+            return expr
+        elif token in _PREFIX:
+            op = OPERATORS[_PREFIX[token]]
+            return Node(kind=_PREFIX[token], children=[self.expression(op.precedence)])
+        else:
+            raise YovecError('unexpected token: {}'.format(token))
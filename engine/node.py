@@ -1,5 +1,5 @@
 from copy import deepcopy
-from typing import List, Optional, Callable
+from typing import Callable, Iterator, List, Optional
 
 from lark.tree import Tree # type: ignore
 
@@ -48,17 +48,25 @@ class Node:
 
     def pretty(self, indent=0) -> str:
         """Pretty-format a node."""
+        return ''.join(self.iter_pretty(indent=indent))
+
+    def iter_pretty(self, indent=0) -> Iterator[str]:
+        """Pretty-format a node, one line at a time."""
         if self.kind == 'program' and self.children is None:
-            return 'program'
-        elif self.children is None:
-            return '{}{} {}\n'.format(Node.sep * indent, self.kind, self.value)
-        else:
-            s = ''.join(c.pretty(indent=indent+1) for c in self.children)
-            return '{}{}\n{}'.format(Node.sep * indent, self.kind, s)
+            yield 'program'
+            return
+        stack = [(self, indent)]
+        while len(stack) > 0:
+            node, depth = stack.pop()
+            if node.children is None:
+                yield '{}{} {}\n'.format(Node.sep * depth, node.kind, node.value)
+            else:
+                yield '{}{}\n'.format(Node.sep * depth, node.kind)
+                stack.extend((c, depth + 1) for c in reversed(node.children))
 
     def clone(self) -> 'Node':
-        """Clone a node."""
-        return deepcopy(self)
+        """Clone a node, detached from its parent."""
+        return deepcopy(self, {id(self.parent): None})
 
     def find(self, predicate: Callable[['Node'], bool], found: Optional[List['Node']]=None) -> List['Node']:
         """Recursively find children that satisfy a predicate."""
@@ -1,7 +1,23 @@
-from operator import add, sub, mul, truediv, mod, pow, lt, le, gt, ge, eq, ne, and_, or_
+from math import acos, asin, atan, cos, degrees, radians, sin, sqrt, tan
+from operator import add, sub, mul, truediv, mod, pow, lt, le, gt, ge, eq, ne, and_, or_, neg, not_
 from typing import Union
 
 
+# Trigonometric functions take and return degrees
+UNARY = {
+    'neg': neg,
+    'not': not_,
+    'abs': abs,
+    'sqrt': sqrt,
+    'sin': lambda x: sin(radians(x)),
+    'cos': lambda x: cos(radians(x)),
+    'tan': lambda x: tan(radians(x)),
+    'arcsin': lambda x: degrees(asin(x)),
+    'arccos': lambda x: degrees(acos(x)),
+    'arctan': lambda x: degrees(atan(x))
+}
+
+
 ARITHMETIC = {
     'add': add,
     'sub': sub,
@@ -35,11 +51,21 @@ class Decimal:
         else:
             return str(self.value)
 
+    def unary(self, op: str) -> 'Decimal':
+        """Apply a unary operation to a decimal."""
+        try:
+            return Decimal(round(UNARY[op](self.value), 4))
+        except ValueError:
+            raise ArithmeticError('math domain error: {} {}'.format(op, self))
+
     def binary(self, op: str, other: 'Decimal') -> 'Decimal':
         """Apply a binary operation to two decimals."""
         try:
-            return Decimal(round(ARITHMETIC[op](self.value, other.value), 4))
+            result = ARITHMETIC[op](self.value, other.value)
         except KeyError:
-            left = int(0 == self.value)
-            right = int(0 == other.value)
+            left = int(0 != self.value)
+            right = int(0 != other.value)
             return Decimal(round(BOOLEAN[op](left, right), 4))
+        if isinstance(result, complex):
+            raise ArithmeticError('math domain error: {} {} {}'.format(self, op, other))
+        return Decimal(round(result, 4))
@@ -1,7 +1,9 @@
-from itertools import product
+from collections import Counter
+from heapq import heappop, heappush
+from itertools import count, product
 from logging import getLogger
 from string import ascii_lowercase
-from typing import Sequence
+from typing import Dict, Iterator, List, Sequence, Set
 
 from engine.log import LOGGER_NAME
 logger = getLogger(LOGGER_NAME)
@@ -9,22 +11,25 @@ logger = getLogger(LOGGER_NAME)
 from engine.node import Node
 
 
+def _names() -> Iterator[str]:
+    """Lazily generate names, shortest first."""
+    for size in count(1):
+        for letters in product(ascii_lowercase, repeat=size):
+            yield ''.join(letters)
+
+
 class Pool:
     """Generate names from a pool."""
     def __init__(self, excluded: Sequence[str]):
         logger.debug('creating name pool')
-        self.excluded = excluded
+        self.excluded = set(excluded)
         self.replaced = {}
-        self.pool = []
-        self.size = 1
+        self.names = _names()
 
     def gen(self) -> str:
         """Generate the next name."""
         logger.debug('generating name')
-        if len(self.pool) == 0:
-            self.pool = [''.join(x) for x in product(ascii_lowercase, repeat=self.size)]
-            self.size += 1
-        return self.pool.pop(0)
+        return next(self.names)
 
     def replace(self, name: str) -> str:
         """Replace a name."""
@@ -42,12 +47,70 @@ class Pool:
 
 
 def mangle_names(program: Node, imported: Sequence[str], exported: Sequence[str]) -> Node:
-    """Mangle names in a YOLOL program."""
+    """Mangle names in a YOLOL program.
+
+    Variables whose live ranges do not overlap share a name,
+    and the most frequently referenced names are given the shortest replacements.
+    """
     assert program.kind == 'program'
     logger.debug('mangling names')
     clone = program.clone()
-    pool = Pool([*imported, *exported])
+    excluded = [*imported, *exported]
+    pool = Pool(excluded)
+    shared = _share_names(clone, set(excluded))
     variables = clone.find(lambda node: node.kind == 'variable')
+    frequency = Counter(shared.get(var.value, var.value) for var in variables)
+    # Ties are broken by order of first appearance, since sorting is stable
+    for name in sorted(frequency, key=lambda name: -frequency[name]):
+        pool.replace(name) # type: ignore
     for var in variables:
-        var.value = pool.replace(var.value) # type: ignore
+        name = shared.get(var.value, var.value)
+        var.value = pool.replaced.get(name, name) # type: ignore
     return clone
+
+
+def _share_names(program: Node, excluded: Set[str]) -> Dict[str, str]:
+    """Find variables that can share a name.
+
+    A variable is live from its assignment until its last use. Since programs are straight-line code,
+    the interference graph is an interval graph, so a linear scan over assignments colours it optimally.
+    A variable may take over a name in the same assignment that last uses it,
+    since the expression is evaluated before the assignment.
+
+    Returns a map from each shareable variable to the first variable with the same name.
+    """
+    assert program.kind == 'program'
+    logger.debug('finding variables that can share names')
+    defined = {} # type: Dict[str, int]
+    last_use = {} # type: Dict[str, int]
+    unsafe = set(excluded)
+    assignments = program.find(lambda node: node.kind == 'assignment')
+    for position, asn in enumerate(assignments):
+        for var in asn.children[1].find(lambda node: node.kind == 'variable'):
+            if var.value not in defined:
+                # Used before assignment, so the value must survive between runs
+                unsafe.add(var.value)
+            last_use[var.value] = position
+        name = asn.children[0].value
+        if name in defined:
+            unsafe.add(name)
+        defined[name] = position
+
+    shared = {}
+    active = [] # type: List
+    free = [] # type: List[int]
+    owners = [] # type: List[str]
+    for name, position in defined.items():
+        if name in unsafe:
+            continue
+        while len(active) > 0 and active[0][0] <= position:
+            _, register = heappop(active)
+            heappush(free, register)
+        if len(free) > 0:
+            register = heappop(free)
+        else:
+            register = len(owners)
+            owners.append(name)
+        shared[name] = owners[register]
+        heappush(active, (last_use.get(name, position), register))
+    return shared
@@ -1,5 +1,6 @@
+from concurrent.futures import ProcessPoolExecutor
 from logging import getLogger
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 
 from engine.log import LOGGER_NAME
 logger = getLogger(LOGGER_NAME)
@@ -8,19 +9,117 @@ from engine.context import context
 from engine.errors import YovecError
 from engine.node import Node
 
+from engine.format.flat import flat_to_node, node_to_flat
 from engine.optimize.decimal import Decimal
+from engine.stats import Stats
 
 
-def reduce_expressions(program: Node) -> Node:
-    """Reduce expressions in a YOLOL program."""
+def reduce_expressions(program: Node, jobs: int=1, stats: Optional[Stats]=None) -> Node:
+    """Reduce expressions in a YOLOL program.
+
+    If there are multiple jobs, independent lines are reduced in parallel.
+    The number of rewrites is counted in the stats, if any.
+    """
     assert program.kind == 'program'
     logger.debug('reducing expressions')
     clone = program.clone()
-    while _propagate_constants(clone) or _fold_constants(clone):
-        pass
+    rewrites = 0
+    levels = _level_lines(clone) if jobs > 1 else None
+    if levels is not None:
+        clone, rewrites = _reduce_levels(clone, levels, jobs)
+    else:
+        if jobs > 1:
+            logger.debug('lines are not in dependency order; reducing sequentially')
+        while _propagate_constants(clone) or _fold_constants(clone):
+            rewrites += 1
+    if stats is not None:
+        stats.count('reduce_rewrites', rewrites)
     return clone
 
 
+def _level_lines(program: Node) -> Optional[List[List[Node]]]:
+    """Group lines into levels, such that each line only depends on lines in earlier levels.
+
+    Returns None if a line depends on itself or on a later line.
+    """
+    assert program.kind == 'program'
+    if program.children is None:
+        return []
+    defined = {} # type: Dict[str, int]
+    for index, line in enumerate(program.children):
+        for asn in line.children:
+            defined[asn.children[0].value] = index
+    depths = [] # type: List[int]
+    levels = [] # type: List[List[Node]]
+    for index, line in enumerate(program.children):
+        depth = 0
+        for asn in line.children:
+            for var in asn.children[1].find(lambda node: node.kind == 'variable'):
+                if var.value not in defined:
+                    continue
+                elif defined[var.value] >= index:
+                    return None
+                depth = max(depth, depths[defined[var.value]] + 1)
+        depths.append(depth)
+        if depth == len(levels):
+            levels.append([])
+        levels[depth].append(line)
+    return levels
+
+
+def _reduce_levels(program: Node, levels: List[List[Node]], jobs: int) -> Tuple[Node, int]:
+    """Reduce each level of lines in parallel, returning the program and the number of rewrites.
+
+    Lines in a level are independent, and every line they depend on has already been reduced,
+    so the propagatable definitions of earlier lines are final.
+    """
+    logger.debug('reducing {} levels of lines with {} jobs'.format(len(levels), jobs))
+    propagatable = {} # type: Dict[str, str]
+    rewrites = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for level in levels:
+            tasks = []
+            for line in level:
+                used = {v.value for v in line.find(lambda node: node.kind == 'variable')}
+                tasks.append((node_to_flat(line), {k: v for k, v in propagatable.items() if k in used}))
+            chunksize = max(1, len(tasks) // (jobs * 4))
+            for line, (reduced, count) in zip(level, executor.map(_reduce_line, tasks, chunksize=chunksize)):
+                rewrites += count
+                replacement = flat_to_node(reduced)
+                program.replace_child(line, replacement)
+                for asn in replacement.children:
+                    expr = asn.children[1]
+                    if expr.kind == 'variable' or len(expr.find(lambda node: node.kind == 'variable')) == 0:
+                        propagatable[asn.children[0].value] = node_to_flat(expr)
+    return program, rewrites
+
+
+def _reduce_line(task: Tuple[str, Dict[str, str]]) -> Tuple[str, int]:
+    """Reduce a line, given the propagatable definitions of the variables that it uses.
+
+    Returns the reduced line and the number of rewrites.
+    """
+    flat, definitions = task
+    line = flat_to_node(flat)
+    propagatable = {k: flat_to_node(v) for k, v in definitions.items()}
+    # Wrap the line in a program, so that the usual transforms apply
+    program = Node(kind='program', children=[line])
+    rewrites = 0
+    delta = True
+    while delta:
+        delta = False
+        for var in program.find(lambda node: node.kind == 'variable' and node.value in propagatable):
+            if var.parent.kind == 'assignment' and var.parent.children.index(var) == 0: # type: ignore
+                continue
+            var.parent.replace_child(var, propagatable[var.value].clone()) # type: ignore
+            rewrites += 1
+            delta = True
+        while _propagate_constants(program) or _fold_constants(program):
+            rewrites += 1
+            delta = True
+    return node_to_flat(line), rewrites
+
+
 def _propagate_constants(program: Node) -> bool:
     """Propagate constants in a program.
 
@@ -0,0 +1,96 @@
+from logging import getLogger
+from typing import List, Optional, Sequence, Set, Tuple
+
+from engine.log import LOGGER_NAME
+logger = getLogger(LOGGER_NAME)
+
+from engine.format.text import LINE_LIMIT, format_expression
+from engine.node import Node
+from engine.optimize.mangle import Pool
+
+
+PREFIX = '_yovec_tmp'
+
+
+def split_assignments(program: Node, imported: Sequence[str], exported: Sequence[str], mangled: bool,
+        limit: int=LINE_LIMIT) -> Node:
+    """Split assignments that are too long to fit on a line into partial results.
+
+    An expression is split along its left spine, so ((a+b)+c)+d may become t=a+b, t=t+c, x=t+d.
+    Since every operation is rounded as it is evaluated, the result is unchanged.
+    The assigned variable accumulates the partial results if the remaining terms do not use it.
+    Otherwise, or if the variable is imported or exported and must only ever hold complete values,
+    a temporary variable is used, which is shared by every split assignment.
+    """
+    assert program.kind == 'program'
+    logger.debug('splitting long assignments')
+    clone = program.clone()
+    external = {*imported, *exported}
+    temporary = None # type: Optional[str]
+    lines = []
+    for line in clone.children if clone.children is not None else []:
+        assignments = [] # type: List[Node]
+        for asn in line.children if line.children is not None else []:
+            if _length(asn.children[0].value, asn.children[1]) <= limit:
+                assignments.append(asn)
+                continue
+            target = asn.children[0].value
+            first, rest = _spine(asn.children[1])
+            used = {v.value for _, term in rest for v in term.find(lambda node: node.kind == 'variable')}
+            if target in used or target in external:
+                if temporary is None:
+                    temporary = _temporary(program, mangled)
+                accumulator = temporary
+            else:
+                accumulator = target
+            assignments.extend(_chunk(target, accumulator, first, rest, limit))
+        lines.append(Node(kind='line', children=assignments if len(assignments) > 0 else None))
+    return Node(kind='program', children=lines)
+
+
+def _spine(expr: Node) -> Tuple[Node, List[Tuple[str, Node]]]:
+    """Flatten the left spine of an expression into its first term and a list of operations."""
+    rest = [] # type: List[Tuple[str, Node]]
+    while expr.children is not None and len(expr.children) == 2:
+        rest.append((expr.kind, expr.children[1])) # type: ignore
+        expr = expr.children[0]
+    return expr, rest[::-1]
+
+
+def _chunk(target: str, accumulator: str, first: Node, rest: Sequence[Tuple[str, Node]], limit: int) -> List[Node]:
+    """Assign partial results of a flattened expression to an accumulator, then assign the result."""
+    assignments = []
+    expr = first
+    partial = False
+    for i, (op, term) in enumerate(rest):
+        name = target if i == len(rest) - 1 else accumulator
+        candidate = Node(kind=op, children=[expr, term])
+        if partial and _length(name, candidate) > limit:
+            assignments.append(_assignment(accumulator, expr))
+            candidate = Node(kind=op, children=[Node(kind='variable', value=accumulator), term])
+        expr = candidate
+        partial = True
+    assignments.append(_assignment(target, expr))
+    return assignments
+
+
+def _assignment(variable: str, expr: Node) -> Node:
+    """Create an assignment."""
+    return Node(kind='assignment', children=[Node(kind='variable', value=variable), expr])
+
+
+def _length(variable: str, expr: Node) -> int:
+    """Get the length of a formatted assignment."""
+    return len(variable) + len('=') + len(format_expression(expr))
+
+
+def _temporary(program: Node, mangled: bool) -> str:
+    """Choose a name for a temporary variable that does not appear in a program."""
+    names = {v.value for v in program.find(lambda node: node.kind == 'variable')} # type: Set[str]
+    if not mangled:
+        return next('{}{}'.format(PREFIX, i) for i in range(len(names) + 1) if '{}{}'.format(PREFIX, i) not in names)
+    pool = Pool(names)
+    while True:
+        name = pool.gen()
+        if name not in pool.excluded:
+            return name
@@ -0,0 +1,34 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from logging import getLogger
+from typing import Any, Callable, Iterator, Sequence
+
+from engine.log import LOGGER_NAME
+logger = getLogger(LOGGER_NAME)
+
+from engine.node import Node
+
+from engine.format.flat import flat_to_node, node_to_flat
+
+
+def map_nodes(func: Callable[[Node], Any], nodes: Sequence[Node], jobs: int) -> Iterator[Any]:
+    """Apply a function to each node, yielding the results in order.
+
+    If there are multiple jobs, nodes are sent to worker processes in the flat AST format,
+    since pickling a node would follow its parent links. The function must be picklable.
+    """
+    if jobs <= 1 or len(nodes) <= 1:
+        for node in nodes:
+            yield func(node)
+        return
+    logger.debug('mapping {} nodes with {} jobs'.format(len(nodes), jobs))
+    chunksize = max(1, len(nodes) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        flats = [node_to_flat(node) for node in nodes]
+        for result in executor.map(partial(_apply, func), flats, chunksize=chunksize):
+            yield result
+
+
+def _apply(func: Callable[[Node], Any], flat: str) -> Any:
+    """Apply a function to a node in the flat AST format."""
+    return func(flat_to_node(flat))
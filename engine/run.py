@@ -1,50 +1,212 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
 
 from lark import Lark # type: ignore
 
+from engine.cache import OutputCache
 from engine.context import Context
 from engine.errors import YovecError
 from engine.grammar import YOVEC_EBNF
 from engine.node import Node
+from engine.stats import Stats
 
-from engine.format.cylon import yolol_to_cylon
-from engine.format.text import yolol_to_text
+from engine.format.cylon import iter_compact_cylon, iter_cylon
+from engine.format.flat import iter_flat
+from engine.format.text import iter_text
 
 from engine.optimize.elim import eliminate_dead_code
 from engine.optimize.mangle import mangle_names
 from engine.optimize.reduce import reduce_expressions
+from engine.optimize.split import split_assignments
 
+from engine.transpile.incremental import Snapshots
+from engine.transpile.profile import Profiler
 from engine.transpile.transpiler import Transpiler
 from engine.transpile.resolve import resolve_aliases
 
 
-def run_yovec(source: str, root: str, no_elim: bool, no_reduce: bool, no_mangle: bool, ast: bool, cylon: bool) -> str:
-    """Run Yovec."""
+# Options accepted by run_yovec, with their default values
+OPTIONS = {
+    'no_elim': False,
+    'no_reduce': False,
+    'no_mangle': False,
+    'ast': False,
+    'cylon': False,
+    'compact': False,
+    'flat': False,
+    'budget': None,
+    'budget_mode': 'materialize'
+}
+
+# Ways of handling expressions over budget
+BUDGET_MODES = ('materialize', 'abort')
+
+
+# The output of a run, with its stats
+Compilation = namedtuple('Compilation', ('output', 'stats'))
+
+
+@lru_cache(maxsize=None)
+def make_parser() -> Lark: # type: ignore
+    """Make a Yovec parser.
+
+    Building the grammar is expensive, so the parser is shared between runs.
+    """
+    return Lark(YOVEC_EBNF, start='program') # type: ignore
+
+
+def run_yovec(source: str, root: str, no_elim: bool=False, no_reduce: bool=False, no_mangle: bool=False,
+        ast: bool=False, cylon: bool=False, compact: bool=False, flat: bool=False, cache: Optional[OutputCache]=None,
+        snapshots: Optional[Snapshots]=None, jobs: int=1, budget: Optional[int]=None, budget_mode: str='materialize') -> str:
+    """Run Yovec, using cached output and snapshots if possible."""
+    return ''.join(stream_yovec(source, root, no_elim, no_reduce, no_mangle, ast, cylon, compact, flat,
+        cache, snapshots, jobs, budget, budget_mode))
+
+
+def compile_yovec(source: str, root: str, no_elim: bool=False, no_reduce: bool=False, no_mangle: bool=False,
+        ast: bool=False, cylon: bool=False, compact: bool=False, flat: bool=False,
+        snapshots: Optional[Snapshots]=None, jobs: int=1, profiler: Optional[Profiler]=None, budget: Optional[int]=None,
+        budget_mode: str='materialize') -> Compilation:
+    """Run Yovec, collecting stats about each stage and profiling statements if requested.
+
+    The cache is not used, since cached outputs have no stats.
+    """
+    options = {
+        'no_elim': no_elim,
+        'no_reduce': no_reduce,
+        'no_mangle': no_mangle,
+        'ast': ast,
+        'cylon': cylon,
+        'compact': compact,
+        'flat': flat,
+        'budget': budget,
+        'budget_mode': budget_mode
+    }
+    stats = Stats()
+    chunks = _stream_yovec(source, root, options, snapshots, jobs, stats=stats, profiler=profiler)
+    with stats.stage('format'):
+        output = ''.join(chunks)
+    stats.count('output_lines', len(output.splitlines()))
+    stats.count('output_characters', len(output))
+    return Compilation(output=output, stats=stats)
+
+
+def stream_yovec(source: str, root: str, no_elim: bool=False, no_reduce: bool=False, no_mangle: bool=False,
+        ast: bool=False, cylon: bool=False, compact: bool=False, flat: bool=False, cache: Optional[OutputCache]=None,
+        snapshots: Optional[Snapshots]=None, jobs: int=1, budget: Optional[int]=None,
+        budget_mode: str='materialize') -> Iterator[str]:
+    """Run Yovec, returning the output in chunks as it is formatted.
+
+    Errors are raised before any output is produced.
+    If there are multiple jobs, independent lines are optimized and formatted in parallel.
+    """
+    options = {
+        'no_elim': no_elim,
+        'no_reduce': no_reduce,
+        'no_mangle': no_mangle,
+        'ast': ast,
+        'cylon': cylon,
+        'compact': compact,
+        'flat': flat,
+        'budget': budget,
+        'budget_mode': budget_mode
+    }
+    if cache is None:
+        return _stream_yovec(source, root, options, snapshots, jobs)
+    key = cache.key(source, root, options)
+    output = cache.get(key)
+    if output is None:
+        output = ''.join(_stream_yovec(source, root, options, snapshots, jobs))
+        cache.put(key, output)
+    return iter([output])
+
+
+def _stream_yovec(source: str, root: str, options: Dict[str, Any], snapshots: Optional[Snapshots],
+        jobs: int, stats: Optional[Stats]=None, profiler: Optional[Profiler]=None) -> Iterator[str]:
+    """Run each stage of Yovec, recording stats and profiling statements if requested."""
+    Context.reset()
+    if options['budget'] is not None and (type(options['budget']) != int or options['budget'] < 1):
+        raise YovecError('Budget error: expected budget to be a positive integer')
+    if options['budget_mode'] not in BUDGET_MODES:
+        raise YovecError('Budget error: expected budget mode to be one of {}'.format(', '.join(BUDGET_MODES)))
     try:
-        parser = Lark(YOVEC_EBNF, start='program') # type: ignore
-        yovec = Node.from_tree(parser.parse(source))
+        parser = make_parser()
+        with _stage(stats, 'parse'):
+            yovec = Node.from_tree(parser.parse(source))
     except Exception as e:
         raise YovecError('Parse error: {}'.format(str(e)))
+    _record_nodes(stats, 'parse', yovec)
 
     try:
-        transpiler = Transpiler(parser, root) # type: ignore
-        env, yolol = transpiler.program(yovec)
-        yolol, imported, exported = resolve_aliases(env, yolol)
+        transpiler = Transpiler(parser, root, snapshots=snapshots, profiler=profiler, # type: ignore
+            budget=options['budget'], budget_mode=options['budget_mode'], fold=not options['no_reduce'])
+        with _stage(stats, 'transpile'):
+            env, yolol = transpiler.program(yovec)
+        _record_nodes(stats, 'transpile', yolol)
+        with _stage(stats, 'resolve'):
+            yolol, imported, exported = resolve_aliases(env, yolol)
+        _record_nodes(stats, 'resolve', yolol)
     except YovecError as e:
         raise YovecError('Transpilation error: {}\n\n{}'.format(str(e), Context.format()))
 
     try:
-        if not no_reduce:
-            yolol = reduce_expressions(yolol)
-        if not no_elim:
-            yolol = eliminate_dead_code(yolol, exported) # type: ignore
-        if not no_mangle:
-            yolol = mangle_names(yolol, imported, exported) # type: ignore
+        if not options['no_reduce']:
+            with _stage(stats, 'reduce'):
+                yolol = reduce_expressions(yolol, jobs=jobs, stats=stats)
+            _record_nodes(stats, 'reduce', yolol)
+        if not options['no_elim']:
+            before = _count_assignments(yolol) if stats is not None else 0
+            with _stage(stats, 'elim'):
+                yolol = eliminate_dead_code(yolol, exported) # type: ignore
+            _record_nodes(stats, 'elim', yolol)
+            if stats is not None:
+                stats.count('elim_removed', before - _count_assignments(yolol))
+        if not options['no_mangle']:
+            with _stage(stats, 'mangle'):
+                yolol = mangle_names(yolol, imported, exported) # type: ignore
+            _record_nodes(stats, 'mangle', yolol)
+            if stats is not None:
+                names = {v.value for v in yolol.find(lambda node: node.kind == 'variable')}
+                stats.count('mangle_names', len(names - set(imported) - set(exported)))
+        before = _count_assignments(yolol) if stats is not None else 0
+        with _stage(stats, 'split'):
+            yolol = split_assignments(yolol, imported, exported, mangled=not options['no_mangle']) # type: ignore
+        _record_nodes(stats, 'split', yolol)
+        if stats is not None:
+            stats.count('split_added', _count_assignments(yolol) - before)
     except YovecError as e:
         raise YovecError('Optimization error: {}\n\n{}'.format(str(e), Context.format()))
 
-    if ast:
-        return yolol.pretty()
-    elif cylon:
-        return yolol_to_cylon(yolol)
+    if options['flat']:
+        return iter_flat(yolol)
+    elif options['ast']:
+        return yolol.iter_pretty()
+    elif options['cylon'] and options['compact']:
+        return iter_compact_cylon(yolol, jobs=jobs)
+    elif options['cylon']:
+        return iter_cylon(yolol, jobs=jobs)
     else:
-        return yolol_to_text(yolol)
+        return iter_text(yolol, jobs=jobs)
+
+
+@contextmanager
+def _stage(stats: Optional[Stats], name: str) -> Iterator[None]:
+    """Time a stage, if recording stats."""
+    if stats is None:
+        yield
+    else:
+        with stats.stage(name):
+            yield
+
+
+def _record_nodes(stats: Optional[Stats], name: str, node: Node):
+    """Record the number of nodes after a stage, if recording stats."""
+    if stats is not None:
+        stats.record_nodes(name, node)
+
+
+def _count_assignments(program: Node) -> int:
+    """Count the assignments of a program."""
+    return len(program.find(lambda node: node.kind == 'assignment'))
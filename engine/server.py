@@ -0,0 +1,95 @@
+import json
+import os
+from logging import getLogger
+from socketserver import StreamRequestHandler, UnixStreamServer
+from typing import Any, Dict, IO, Optional
+
+from engine.log import LOGGER_NAME
+logger = getLogger(LOGGER_NAME)
+
+from engine.cache import OutputCache
+from engine.errors import YovecError
+from engine.run import OPTIONS, make_parser, run_yovec
+
+from engine.transpile.incremental import Snapshots
+
+
+def handle_request(request: Any, root: str, cache: Optional[OutputCache]=None,
+        snapshots: Optional[Snapshots]=None) -> Dict[str, Any]:
+    """Handle a single transpile request.
+
+    A request is an object with a source and any options of run_yovec.
+    The response echoes the request id, if any, and holds either the output or an error.
+    Unexpected exceptions are reported as internal errors, so that one request cannot stop the server.
+    """
+    if not isinstance(request, dict):
+        return {'id': None, 'error': 'Request error: expected an object'}
+    response = {'id': request.get('id')} # type: Dict[str, Any]
+
+    source = request.get('source')
+    if not isinstance(source, str):
+        response['error'] = 'Request error: expected source to be a string'
+        return response
+    unknown = set(request) - set(OPTIONS) - {'id', 'source'}
+    if len(unknown) > 0:
+        response['error'] = 'Request error: unknown options: {}'.format(', '.join(sorted(unknown)))
+        return response
+
+    options = {k: request.get(k, v) for k, v in OPTIONS.items()}
+    try:
+        response['output'] = run_yovec(source, root=root, cache=cache, snapshots=snapshots, **options)
+    except YovecError as e:
+        response['error'] = str(e)
+    except Exception as e:
+        logger.debug('unexpected exception while handling request - {}'.format(repr(e)))
+        response['error'] = 'Internal error: {}'.format(str(e))
+    return response
+
+
+def handle_line(line: str, root: str, cache: Optional[OutputCache]=None, snapshots: Optional[Snapshots]=None) -> str:
+    """Handle a JSON-encoded request line, returning a JSON-encoded response line."""
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        response = {'id': None, 'error': 'Request error: {}'.format(str(e))}
+    else:
+        response = handle_request(request, root, cache=cache, snapshots=snapshots)
+    return json.dumps(response) + '\n'
+
+
+def serve_stdio(root: str, infile: IO[str], outfile: IO[str], cache: Optional[OutputCache]=None):
+    """Serve JSON-lines requests from a stream until end of input."""
+    logger.debug('serving requests on stdio')
+    make_parser()
+    snapshots = Snapshots()
+    for line in infile:
+        if line.strip() == '':
+            continue
+        outfile.write(handle_line(line, root, cache=cache, snapshots=snapshots))
+        outfile.flush()
+
+
+def serve_socket(path: str, root: str, cache: Optional[OutputCache]=None):
+    """Serve JSON-lines requests on a Unix socket until interrupted.
+
+    Connections are handled one at a time, since transpilation uses global context.
+    Snapshots are shared between connections.
+    """
+    logger.debug('serving requests on socket - {}'.format(path))
+    make_parser()
+    snapshots = Snapshots()
+
+    class Handler(StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                line = line.decode('utf-8')
+                if line.strip() == '':
+                    continue
+                self.wfile.write(handle_line(line, root, cache=cache, snapshots=snapshots).encode('utf-8'))
+                self.wfile.flush()
+
+    with UnixStreamServer(path, Handler) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Dict, Iterator
+
+from engine.node import Node
+
+
+class Stats:
+    """Collect per-stage timings and counters from a run of Yovec.
+
+    Node counts are recorded after each stage, so the effect of each optimizer can be seen.
+    """
+    def __init__(self):
+        self.seconds = OrderedDict() # type: OrderedDict
+        self.nodes = OrderedDict() # type: OrderedDict
+        self.counters = OrderedDict() # type: OrderedDict
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a stage."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0) + perf_counter() - start
+
+    def record_nodes(self, name: str, node: Node):
+        """Record the number of nodes after a stage."""
+        self.nodes[name] = count_nodes(node)
+
+    def count(self, name: str, n: int=1):
+        """Add to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the stats as a JSON-compatible object."""
+        return {'seconds': dict(self.seconds), 'nodes': dict(self.nodes), 'counters': dict(self.counters)}
+
+    def format(self) -> str:
+        """Format the stats as a report."""
+        lines = ['{:<12} {:>10} {:>8}'.format('Stage', 'Seconds', 'Nodes')]
+        for name, seconds in self.seconds.items():
+            nodes = self.nodes.get(name)
+            lines.append('{:<12} {:>10.4f} {:>8}'.format(name, seconds, nodes if nodes is not None else '-'))
+        lines.append('{:<12} {:>10.4f}'.format('total', sum(self.seconds.values())))
+        for name, value in self.counters.items():
+            lines.append('{}: {}'.format(name.replace('_', ' '), value))
+        return '\n'.join(lines)
+
+
+def count_nodes(node: Node) -> int:
+    """Count a node and its descendants."""
+    count = 0
+    stack = [node]
+    while len(stack) > 0:
+        node = stack.pop()
+        count += 1
+        if node.children is not None:
+            stack.extend(node.children)
+    return count
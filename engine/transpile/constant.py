@@ -0,0 +1,132 @@
+from contextlib import contextmanager
+from math import isfinite
+from typing import Iterator, List, Optional, Sequence
+
+from engine.optimize.decimal import Decimal
+from engine.transpile.number import Number
+
+try:
+    import numpy # type: ignore
+except ImportError:
+    numpy = None
+
+
+# Binary operations that NumPy computes exactly as Python floats do, given float arrays
+if numpy is not None:
+    NUMPY_BINARY = {
+        'add': numpy.add,
+        'sub': numpy.subtract,
+        'mul': numpy.multiply,
+        'div': numpy.true_divide,
+        'lt': numpy.less,
+        'le': numpy.less_equal,
+        'gt': numpy.greater,
+        'ge': numpy.greater_equal,
+        'eq': numpy.equal,
+        'ne': numpy.not_equal
+    }
+else:
+    NUMPY_BINARY = {}
+
+
+class Folding:
+    """Stores whether operations on constant vectors and matrices are folded during transpilation.
+
+    Folding is a form of expression reduction, so it is disabled along with it.
+    Use the folding context manager to change it, so that the setting does not outlive a run.
+    """
+    enabled = True
+
+
+@contextmanager
+def folding(enabled: bool) -> Iterator[None]:
+    """Enable or disable folding within a block, then restore the previous setting."""
+    previous = Folding.enabled
+    Folding.enabled = enabled
+    try:
+        yield
+    finally:
+        Folding.enabled = previous
+
+
+def fold_binary(op: str, left: Sequence[Number], right: Sequence[Number]) -> Optional[List[Number]]:
+    """Apply a binary operation to pairs of constant numbers.
+
+    Returns None if any number is not constant or the operation fails, so that the caller can
+    fall back to building expressions. Unary operations are never folded, since reduce does not
+    fold them either.
+    """
+    lvalues = _values(left)
+    rvalues = _values(right)
+    if lvalues is None or rvalues is None:
+        return None
+    try:
+        if op in NUMPY_BINARY:
+            with numpy.errstate(all='raise'):
+                result = NUMPY_BINARY[op](numpy.array(lvalues, dtype=float), numpy.array(rvalues, dtype=float))
+            return [_number(v) for v in result.tolist()]
+        return [_number(Decimal(l).binary(op, Decimal(r)).value) for l, r in zip(lvalues, rvalues)]
+    except ArithmeticError:
+        return None
+
+
+def fold_dot(left: Sequence[Number], right: Sequence[Number]) -> Optional[Number]:
+    """Calculate the dot product of constant vectors."""
+    rows = fold_matmul([left], [[n] for n in right])
+    return rows[0][0] if rows is not None else None
+
+
+def fold_matmul(left: Sequence[Sequence[Number]], right: Sequence[Sequence[Number]]) -> Optional[List[List[Number]]]:
+    """Multiply constant matrices, given as lists of rows.
+
+    Each product and each partial sum is rounded, as when the expressions are reduced.
+    """
+    lvalues = [_values(row) for row in left]
+    rvalues = [_values(row) for row in right]
+    if any(row is None for row in lvalues) or any(row is None for row in rvalues):
+        return None
+    try:
+        if numpy is not None:
+            with numpy.errstate(all='raise'):
+                products = _round(numpy.array(lvalues, dtype=float)[:, :, None] * numpy.array(rvalues, dtype=float)[None, :, :])
+                sums = products[:, 0, :]
+                for k in range(1, products.shape[1]):
+                    sums = _round(sums + products[:, k, :])
+            return [[_number(v) for v in row] for row in sums.tolist()]
+        rows = []
+        for lrow in lvalues:
+            row = []
+            for j in range(len(rvalues[0])):
+                total = Decimal(lrow[0]).binary('mul', Decimal(rvalues[0][j]))
+                for k in range(1, len(lrow)):
+                    total = total.binary('add', Decimal(lrow[k]).binary('mul', Decimal(rvalues[k][j])))
+                row.append(_number(total.value))
+            rows.append(row)
+        return rows
+    except ArithmeticError:
+        return None
+
+
+def _values(nums: Sequence[Number]) -> Optional[List[float]]:
+    """Get the values of constant numbers, or None if folding is disabled or a number is not constant."""
+    if not Folding.enabled:
+        return None
+    values = []
+    for n in nums:
+        if type(n.initial) == str or len(n.queue) > 0:
+            return None
+        values.append(n.initial)
+    return values
+
+
+def _round(array):
+    """Round an array to 4 decimals, exactly as Python rounds floats."""
+    return numpy.array([round(v, 4) for v in array.ravel().tolist()]).reshape(array.shape)
+
+
+def _number(value: float) -> Number:
+    """Make a number from a value, rounded to 4 decimals."""
+    value = round(float(value), 4)
+    if not isfinite(value):
+        raise ArithmeticError('result is not finite: {}'.format(value))
+    return Number(int(value)) if value.is_integer() else Number(value)
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from hashlib import sha256
+from logging import getLogger
+from typing import List, Optional, Sequence, Tuple
+
+from engine.log import LOGGER_NAME
+logger = getLogger(LOGGER_NAME)
+
+from engine.env import Env
+from engine.errors import YovecError
+from engine.node import Node
+
+from engine.transpile.library import find_library
+
+
+class Snapshots:
+    """Store the state of a program after each statement.
+
+    Each snapshot is keyed by a hash of every statement up to and including its own,
+    so a program that shares a prefix with an earlier one can resume after that prefix.
+    The least recently used snapshots are evicted once the capacity is reached.
+    """
+    def __init__(self, capacity: int=4096):
+        logger.debug('creating snapshots with capacity - {}'.format(capacity))
+        self.capacity = capacity
+        self._snapshots = OrderedDict() # type: OrderedDict
+
+    def keys(self, statements: Sequence[Node], root: str, fold: bool=True, budget: Optional[int]=None,
+            budget_mode: str='materialize') -> List[str]:
+        """Hash each prefix of a sequence of statements, along with the settings that affect transpilation."""
+        digest = sha256('{}:{}:{}:{}'.format(root, fold, budget, budget_mode).encode('utf-8'))
+        keys = []
+        for statement in statements:
+            digest.update(str(statement).encode('utf-8'))
+            if statement.kind == 'using':
+                digest.update(self._library_text(statement.children[0].value, root).encode('utf-8'))
+            keys.append(digest.hexdigest())
+            digest = sha256(digest.digest())
+        return keys
+
+    def restore(self, keys: Sequence[str]) -> Tuple[int, Optional[Env], List[Node]]:
+        """Restore the longest stored prefix.
+
+        Returns the number of restored statements, the environment after them, and their lines.
+        """
+        env = None
+        lines = []
+        for i, key in enumerate(keys):
+            if key not in self._snapshots:
+                logger.debug('restored {} of {} statements'.format(i, len(keys)))
+                return i, env, lines
+            self._snapshots.move_to_end(key)
+            env, line = self._snapshots[key]
+            if line is not None:
+                lines.append(line.clone())
+        logger.debug('restored all {} statements'.format(len(keys)))
+        return len(keys), env, lines
+
+    def put(self, key: str, env: Env, line: Optional[Node]):
+        """Store the environment and line after a statement."""
+        self._snapshots[key] = (env, line.clone() if line is not None else None)
+        self._snapshots.move_to_end(key)
+        while len(self._snapshots) > self.capacity:
+            self._snapshots.popitem(last=False)
+
+    @staticmethod
+    def _library_text(ident: str, root: str) -> str:
+        """Read a library, so that changing it invalidates later snapshots."""
+        try:
+            with open(str(find_library(ident, root))) as f:
+                return f.read()
+        except (YovecError, IOError):
+            return ''
@@ -1,6 +1,6 @@
 from logging import getLogger
 from pathlib import Path
-from typing import Sequence
+from typing import Dict, Sequence, Tuple
 
 from engine.log import LOGGER_NAME
 logger = getLogger(LOGGER_NAME)
@@ -9,17 +9,42 @@ from engine.errors import YovecError
 from engine.node import Node
 
 
-def use_library(ident: str, parser, root: str) -> Sequence[Node]:
-    """Use definitions from a library."""
-    logger.debug('using definitions from library - {}'.format(ident))
+# Parsed definitions, keyed by library path and modification time
+_cache = {} # type: Dict[Tuple[str, int], Sequence[Node]]
+
+# Library paths, keyed by library identifier and root
+_index = {} # type: Dict[Tuple[str, str], Path]
+
+
+def find_library(ident: str, root: str) -> Path:
+    """Find the file of a library."""
+    key = (ident, str(root))
+    if key in _index and _index[key].exists():
+        return _index[key]
     matches = list(Path(root).glob('**/{}.lib.yovec'.format(ident))) # type: ignore
     if len(matches) == 0:
         raise YovecError('library not found: {}'.format(ident))
     if len(matches) > 1:
         raise YovecError('multiple files found for library {}: {}'.format(ident, [str(p) for p in matches]))
+    _index[key] = matches[0]
+    return matches[0]
+
+
+def use_library(ident: str, parser, root: str) -> Sequence[Node]:
+    """Use definitions from a library."""
+    logger.debug('using definitions from library - {}'.format(ident))
+    path = find_library(ident, root)
+
+    try:
+        key = (str(path.resolve()), path.stat().st_mtime_ns)
+    except OSError as e:
+        raise YovecError('unable to load library {}: {}'.format(ident, str(e)))
+    if key in _cache:
+        logger.debug('using cached library - {}'.format(ident))
+        return [d.clone() for d in _cache[key]]
 
     try:
-        with open(matches[0]) as f:
+        with open(path) as f:
             text = f.read()
     except IOError as e:
         raise YovecError('unable to load library {}: {}'.format(ident, str(e)))
@@ -35,7 +60,9 @@ def use_library(ident: str, parser, root: str) -> Sequence[Node]:
         if statement.kind == 'comment':
             continue
         elif statement.kind.startswith('def_'): # type: ignore
+            statement.parent = None
             definitions.append(statement)
         else:
             raise YovecError('invalid statement in library {}: {}'.format(ident, statement))
+    _cache[key] = [d.clone() for d in definitions]
     return definitions
@@ -1,15 +1,20 @@
 from copy import deepcopy
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from engine.errors import YovecError
 from engine.node import Node
 
+from engine.transpile.constant import fold_matmul
 from engine.transpile.number import Number
 from engine.transpile.vector import Vector
 
 
 class Matrix:
-    """Represents a list of vectors."""
+    """Represents a list of vectors.
+
+    Elements are stored in a single row-major list. Strides map row and column indices to
+    positions in the list, so rows, columns and transposes are views of the same list.
+    """
     PREFIX = '_yovec_mat'
 
     def __init__(self, vecs: List[Vector]):
@@ -18,67 +23,78 @@ class Matrix:
             for v in vecs[1:]:
                 if v.length != vecs[0].length:
                     raise YovecError('all vectors in a matrix must have the same length')
-        self.vecs = vecs
-        self._rows = len(self.vecs)
-        self._cols = self.vecs[0].length
+        self._data = [n for v in vecs for n in v.nums]
+        self._rows = len(vecs)
+        self._cols = vecs[0].length
+        self._strides = (self._cols, 1)
+
+    @classmethod
+    def view(cls, data: List[Number], shape: Tuple[int, int], strides: Optional[Tuple[int, int]]=None) -> 'Matrix':
+        """Create a matrix from the elements of a list, without copying them.
+
+        Without strides, the elements are in row-major order.
+        """
+        assert shape[0] > 0 and shape[1] > 0
+        mat = cls.__new__(cls)
+        mat._data = data
+        mat._rows, mat._cols = shape
+        mat._strides = strides if strides is not None else (shape[1], 1)
+        return mat
 
     @property
     def class_name(self):
         return 'matrix'
 
+    @property
+    def vecs(self) -> List[Vector]:
+        """Return the rows of the matrix as a list."""
+        return [self._row(i) for i in range(self._rows)]
+
+    @property
+    def size(self) -> int:
+        """Return the number of nodes in the largest element expression."""
+        return max(n.size for n in self._data)
+
     # Operations
 
     def matbinary(self, op: str, other: 'Matrix') -> 'Matrix':
         """Apply a binary operation to two matrices."""
         if self._rows != other._rows or self._cols != other._cols:
             raise YovecError('cannot apply operation {} to matrices of different sizes'.format(op))
-        return Matrix([v.vecbinary(op.replace('mat_', 'vec_'), other.vecs[i]) for i, v in enumerate(self.vecs)])
+        return self._reshape(self._flatten().vecbinary(op.replace('mat_', 'vec_'), other._flatten()))
 
     def map(self, op: str) -> 'Matrix':
         """Map a unary operation to a matrix."""
-        return Matrix([v.map(op) for v in self.vecs])
+        return self._reshape(self._flatten().map(op))
 
     def premap(self, op: str, other: Number) -> 'Matrix':
         """Premap a binary operation to a matrix."""
-        vecs = []
-        for v in self.vecs:
-            vecs.append(Vector([n.binary(op, other) for n in v.nums]))
-        return Matrix(vecs)
+        return self._reshape(self._flatten().premap(op, other))
 
     def postmap(self, other: Number, op: str) -> 'Matrix':
         """Postmap a binary operation to a matrix."""
-        vecs = []
-        for v in self.vecs:
-            vecs.append(Vector([other.binary(op, n) for n in v.nums]))
-        return Matrix(vecs)
+        return self._reshape(self._flatten().postmap(other, op))
 
     def apply(self, op: str, other: 'Matrix') -> 'Matrix':
         """Apply a binary operation to two matrices."""
         if self._rows != other._rows or self._cols != other._cols:
             raise YovecError('cannot apply operation {} to matrices of different sizes'.format(op))
-        return Matrix([lv.apply(op, rv) for lv, rv in zip(self.vecs, other.vecs)])
+        return self._reshape(self._flatten().apply(op, other._flatten()))
 
     def transpose(self) -> 'Matrix':
         """Return the transpose of the matrix."""
-        vecs = []
-        for i in range(self._cols):
-            vecs.append(Vector([v.nums[i] for v in self.vecs]))
-        return Matrix(vecs)
+        return Matrix.view(self._data, (self._cols, self._rows), (self._strides[1], self._strides[0]))
 
     def matmul(self, other: 'Matrix') -> 'Matrix':
         """Multiply two matrices."""
         if self._cols != other._rows:
             raise YovecError('cannot mulitply matrices with mismatching sizes')
-        vecs = []
-        for i in range(self._rows):
-            nums = []
-            for j in range(other._cols):
-                n = Number(0)
-                for k in range(other._rows):
-                    n = n.binary('add', self.vecs[i].nums[k].binary('mul', other.vecs[k].nums[j]))
-                nums.append(n)
-            vecs.append(Vector(nums))
-        return Matrix(vecs)
+        folded = fold_matmul([v.nums for v in self.vecs], [v.nums for v in other.vecs])
+        if folded is not None:
+            return Matrix.view([n for nums in folded for n in nums], (self._rows, other._cols))
+        rows = self.vecs
+        cols = [other._col(j) for j in range(other._cols)]
+        return Matrix.view([row.dot(col) for row in rows for col in cols], (self._rows, other._cols))
 
     def rows(self) -> Number:
         """Return the number of rows in the matrix."""
@@ -91,32 +107,54 @@ class Matrix:
     def elem(self, row_index: int, col_index: int) -> Number:
         """Get a matrix element by index."""
         try:
-            return self.vecs[row_index].nums[col_index]
+            i = range(self._rows)[row_index]
+            j = range(self._cols)[col_index]
         except IndexError:
             raise YovecError('element indices {}, {} are out of range'.format(row_index, col_index))
+        return self._data[i * self._strides[0] + j * self._strides[1]]
 
     def row(self, index: int) -> Vector:
         """Get a matrix row by index."""
         try:
-            return self.vecs[index]
+            return self._row(range(self._rows)[index])
         except IndexError:
             raise YovecError('row index {} is out of range'.format(index))
 
     def col(self, index: int) -> Vector:
         """Get a matrix column by index."""
         try:
-            return Vector([v.nums[index] for v in self.vecs])
+            return self._col(range(self._cols)[index])
         except IndexError:
             raise YovecError('column index {} is out of range'.format(index))
 
+    def _row(self, i: int) -> Vector:
+        """Get a view of a row, given a non-negative index."""
+        start = i * self._strides[0]
+        return Vector.view(self._data, range(start, start + self._cols * self._strides[1], self._strides[1]))
+
+    def _col(self, j: int) -> Vector:
+        """Get a view of a column, given a non-negative index."""
+        start = j * self._strides[1]
+        return Vector.view(self._data, range(start, start + self._rows * self._strides[0], self._strides[0]))
+
+    def _flatten(self) -> Vector:
+        """Get a view of the elements in row-major order."""
+        if self._strides == (self._cols, 1):
+            return Vector.view(self._data, range(self._rows * self._cols))
+        rs, cs = self._strides
+        return Vector.view(self._data, [i * rs + j * cs for i in range(self._rows) for j in range(self._cols)])
+
+    def _reshape(self, vec: Vector) -> 'Matrix':
+        """Create a matrix with the same shape from the elements of a vector in row-major order."""
+        return Matrix.view(vec.nums, (self._rows, self._cols))
+
     # Resolutions
 
     def assign(self, index: int) -> Tuple[List[Node], 'Matrix']:
         """Generate YOLOL assignment statements."""
         assignments = []
-        vecs = []
+        nums = []
         for i, v in enumerate(self.vecs):
-            nums = []
             for j, n in enumerate(v.nums):
                 expr = n.evaluate()
                 ident = '{}{}_r{}c{}'.format(Matrix.PREFIX, index, i, j)
@@ -124,5 +162,4 @@ class Matrix:
                 asn = Node(kind='assignment', children=[var, expr])
                 assignments.append(asn)
                 nums.append(Number(ident))
-            vecs.append(Vector(nums))
-        return assignments, Matrix(vecs)
+        return assignments, Matrix.view(nums, (self._rows, self._cols))
@@ -11,6 +11,8 @@ class Number:
     def __init__(self, n: Union[int, float, str]):
         self.initial = n
         self.queue = []
+        # The number of nodes in the YOLOL expression
+        self.size = 1
 
     @property
     def class_name(self):
@@ -22,14 +24,20 @@ class Number:
         """Apply a unary operation to a number."""
         clone = deepcopy(self)
         clone.queue.append((op,))
+        clone.size += 1
         return clone
 
     def binary(self, op: str, other: 'Number') -> 'Number':
         """Apply a binary operation to a number."""
         clone = deepcopy(self)
         clone.queue.append((op, other))
+        clone.size += 1 + other.size
         return clone
 
+    def is_literal(self, value: Union[int, float]) -> bool:
+        """Check if a number is a specific literal, with no pending operations."""
+        return type(self.initial) != str and len(self.queue) == 0 and self.initial == value
+
     # Resolutions
 
     def evaluate(self) -> Node:
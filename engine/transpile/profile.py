@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from logging import getLogger
+from typing import Any, List, Optional
+
+from engine.log import LOGGER_NAME
+logger = getLogger(LOGGER_NAME)
+
+from engine.node import Node
+from engine.stats import count_nodes
+
+from engine.format.text import format_expression
+from engine.transpile.matrix import Matrix
+from engine.transpile.number import Number
+from engine.transpile.vector import Vector
+
+
+class Entry:
+    """Represents the cost of a statement or macro call site."""
+    def __init__(self, label: str):
+        self.label = label
+        self.seconds = 0.0
+        self.nodes = 0
+        self.characters = 0
+        self.calls = 0
+
+    def add(self, seconds: float, nodes: int, characters: int):
+        """Add the cost of a single transpilation."""
+        self.seconds += seconds
+        self.nodes += nodes
+        self.characters += characters
+        self.calls += 1
+
+
+class Profiler:
+    """Attribute transpilation cost to source statements and macro call sites.
+
+    Costs are the time spent transpiling and the size of the YOLOL produced, before optimization.
+    Nested macro calls are included in the cost of their callers.
+    """
+    def __init__(self):
+        logger.debug('creating profiler')
+        self.statements = [] # type: List[Entry]
+        self.calls = OrderedDict() # type: OrderedDict
+        self._label = ''
+        self._macros = [] # type: List[str]
+
+    def begin_statement(self, index: int, statement: Node):
+        """Mark the start of a statement, so that macro calls are attributed to it."""
+        self._label = '{}: {}'.format(index + 1, describe(statement))
+        self._macros = []
+
+    def end_statement(self, seconds: float, line: Optional[Node]):
+        """Record the cost of the current statement."""
+        assignments = line.children if line is not None else []
+        entry = Entry(self._label)
+        entry.add(
+            seconds,
+            sum(count_nodes(asn) for asn in assignments),
+            sum(len('{}={}'.format(asn.children[0].value, format_expression(asn.children[1]))) for asn in assignments)
+        )
+        self.statements.append(entry)
+
+    def begin_call(self, macro: str):
+        """Mark the start of a macro call."""
+        self._macros.append('{}!'.format(macro))
+
+    def end_call(self, seconds: float, value: Any):
+        """Record the cost of the innermost macro call."""
+        site = '{} > {}'.format(self._label, ' > '.join(self._macros))
+        if site not in self.calls:
+            self.calls[site] = Entry(site)
+        expressions = _expressions(value)
+        self.calls[site].add(
+            seconds,
+            sum(count_nodes(e) for e in expressions),
+            sum(len(format_expression(e)) for e in expressions)
+        )
+        self._macros.pop()
+
+    def format(self, limit: Optional[int]=20) -> str:
+        """Format a report of the costliest statements and call sites."""
+        lines = []
+        for title, entries in (('Statements', self.statements), ('Macro call sites', list(self.calls.values()))):
+            lines.append('{} by transpile time:'.format(title))
+            lines.append('{:>10} {:>8} {:>10} {:>6}  {}'.format('Seconds', 'Nodes', 'Chars', 'Calls', 'Source'))
+            for entry in sorted(entries, key=lambda e: e.seconds, reverse=True)[:limit]:
+                lines.append('{:>10.4f} {:>8} {:>10} {:>6}  {}'.format(
+                    entry.seconds, entry.nodes, entry.characters, entry.calls, entry.label))
+            if limit is not None and len(entries) > limit:
+                lines.append('{:>10}  ... and {} more'.format('', len(entries) - limit))
+        return '\n'.join(lines)
+
+
+def describe(statement: Node) -> str:
+    """Describe a statement in a few words."""
+    if statement.kind in ('let_num', 'let_vec', 'let_mat'):
+        type_ = {'let_num': 'number', 'let_vec': 'vector', 'let_mat': 'matrix'}[statement.kind]
+        return 'let {} {}'.format(type_, statement.children[0].value)
+    elif statement.kind in ('def_num', 'def_vec', 'def_mat'):
+        return 'define {}'.format(statement.children[0].value)
+    elif statement.kind == 'using':
+        return 'using {}'.format(statement.children[0].value)
+    else:
+        return statement.kind # type: ignore
+
+
+def _expressions(value: Any) -> List[Node]:
+    """Evaluate the YOLOL expressions of a number, vector or matrix."""
+    if type(value) == Number:
+        return [value.evaluate()]
+    elif type(value) == Vector:
+        return [n.evaluate() for n in value.nums]
+    elif type(value) == Matrix:
+        return [n.evaluate() for v in value.vecs for n in v.nums]
+    else:
+        raise AssertionError('unexpected value type: {}'.format(type(value)))
@@ -1,10 +1,10 @@
+import re
 from logging import getLogger
-from typing import Tuple, Optional, Set
+from typing import Tuple, Set
 
 from engine.log import LOGGER_NAME
 logger = getLogger(LOGGER_NAME)
 
-from engine.errors import YovecError
 from engine.node import Node
 
 from engine.env import Env
@@ -13,46 +13,41 @@ from engine.transpile.number import Number
 from engine.transpile.vector import Vector
 
 
+# Splits a generated name into its variable prefix and element suffix
+GENERATED = re.compile(r'^((?:{}|{}|{})\d+)(.*)$'.format(Number.PREFIX, Vector.PREFIX, Matrix.PREFIX))
+
+
 def resolve_aliases(env: Env, program: Node) -> Tuple[Node, Set[str], Set[str]]:
-    """Resolve aliases to their targets in a YOLOL program."""
+    """Resolve aliases to their targets in a YOLOL program.
+
+    The program is modified in place, in a single traversal.
+    """
     assert program.kind == 'program'
     logger.debug('resolving aliases')
 
-    clone = program.clone()
-    imported = set()
-    exported = set()
-
-    for alias, target in env.imports.items():
-        variables = clone.find(lambda node: node.kind == 'variable' and node.value == alias)
-        for var in variables:
-            var.value = target
-            imported.add(target)
-
+    imports = env.imports
+    exports = {}
     for alias, target in env.exports.items():
         var, index = env.var(alias)
-
         if type(var) == Number:
-            num_prefix = '{}{}'.format(Number.PREFIX, index)
-            num_variables = clone.find(lambda node: node.kind == 'variable' and node.value.startswith(num_prefix))
-            for var in num_variables:
-                var.value = var.value.replace(num_prefix, target) # type: ignore
-                exported.add(var.value)
-
+            exports['{}{}'.format(Number.PREFIX, index)] = target
         elif type(var) == Vector:
-            vec_prefix = '{}{}'.format(Vector.PREFIX, index)
-            vec_variables = clone.find(lambda node: node.kind == 'variable' and node.value.startswith(vec_prefix))
-            for var in vec_variables:
-                var.value = var.value.replace(vec_prefix, target) # type: ignore
-                exported.add(var.value)
-
+            exports['{}{}'.format(Vector.PREFIX, index)] = target
         elif type(var) == Matrix:
-            mat_prefix = '{}{}'.format(Matrix.PREFIX, index)
-            mat_variables = clone.find(lambda node: node.kind == 'variable' and node.value.startswith(mat_prefix))
-            for var in mat_variables:
-                var.value = var.value.replace(mat_prefix, target) # type: ignore
-                exported.add(var.value)
-
+            exports['{}{}'.format(Matrix.PREFIX, index)] = target
         else:
             raise AssertionError('unexpected variable type: {}'.format(type(var)))
 
-    return clone, imported, exported
+    imported = set()
+    exported = set()
+    for var in program.find(lambda node: node.kind == 'variable'):
+        if var.value in imports:
+            var.value = imports[var.value]
+            imported.add(var.value)
+            continue
+        match = GENERATED.match(var.value) # type: ignore
+        if match is not None and match.group(1) in exports:
+            var.value = exports[match.group(1)] + match.group(2)
+            exported.add(var.value)
+
+    return program, imported, exported
@@ -1,57 +1,94 @@
 from logging import getLogger
 from pathlib import Path
-from typing import Tuple, Set, Optional
+from time import perf_counter
+from typing import Any, Callable, List, Tuple, Set, Optional
 
 from engine.log import LOGGER_NAME
 logger = getLogger(LOGGER_NAME)
 
-from engine.context import context
+from engine.context import Context, context
 from engine.env import Env
 from engine.grammar import is_nexpr, is_vexpr, is_mexpr
 from engine.errors import YovecError
 from engine.node import Node
 
+from engine.transpile.constant import folding
+from engine.transpile.incremental import Snapshots
 from engine.transpile.macro import Macro
 from engine.transpile.library import use_library
 from engine.transpile.matrix import Matrix
 from engine.transpile.number import Number
+from engine.transpile.profile import Profiler
 from engine.transpile.resolve import resolve_aliases
 from engine.transpile.vector import Vector
 
 
 class Transpiler:
     """Transpile Yovec to YOLOL."""
-    def __init__(self, parser, root: Path):
+    def __init__(self, parser, root: Path, snapshots: Optional[Snapshots]=None, profiler: Optional[Profiler]=None,
+            budget: Optional[int]=None, budget_mode: str='materialize', fold: bool=True):
         logger.debug('creating transpiler with root - {}'.format(root))
         self.parser = parser
         self.root = root
+        self.snapshots = snapshots
+        self.profiler = profiler
+        self.budget = budget
+        self.budget_mode = budget_mode
+        self.fold = fold
+        self._temps = [] # type: List[Node]
 
     def program(self, program: Node, env: Optional[Env]=None) -> Tuple[Env, Node]:
-        """Transpile a program to YOLOL."""
+        """Transpile a program to YOLOL.
+
+        If snapshots are available, statements shared with a previous program are skipped.
+        If a profiler is available, the cost of each transpiled statement is recorded.
+        If there is a budget, expressions with more nodes are materialized or rejected.
+        Operations on constant vectors and matrices are folded unless folding is disabled.
+        """
         assert program.kind == 'program'
         logger.debug('transpiling program')
-        if env is None:
-            env = Env()
         yolol = Node(kind='program')
         statements = [line.children[0] for line in program.children]
-        for statement in statements:
-            if statement.kind == 'import_group':
-                env = self.import_group(env, statement)
-            elif statement.kind == 'export':
-                env = self.export(env, statement)
-            elif statement.kind.startswith('let'): # type: ignore
-                env, line = self.let(env, statement)
+        start = 0
+        keys = None
+        if env is None and self.snapshots is not None:
+            keys = self.snapshots.keys(statements, self.root, self.fold, self.budget, self.budget_mode) # type: ignore
+            start, env, lines = self.snapshots.restore(keys)
+            for line in lines:
                 yolol.append_child(line)
-            elif statement.kind.startswith('def'): # type: ignore
-                env = self.define(env, statement)
-            elif statement.kind == 'using':
-                env = self.using(env, statement)
-            elif statement.kind == 'comment':
-                pass
-            else:
-                raise AssertionError('unexpected statement kind: {}'.format(statement.kind))
+        if env is None:
+            env = Env()
+        with folding(self.fold):
+            for i, statement in enumerate(statements[start:], start):
+                if self.profiler is not None:
+                    self.profiler.begin_statement(i, statement)
+                begin = perf_counter()
+                env, line = self.statement(env, statement)
+                if self.profiler is not None:
+                    self.profiler.end_statement(perf_counter() - begin, line)
+                if keys is not None:
+                    self.snapshots.put(keys[i], env, line) # type: ignore
+                if line is not None:
+                    yolol.append_child(line)
         return env, yolol
 
+    def statement(self, env: Env, statement: Node) -> Tuple[Env, Optional[Node]]:
+        """Transpile a statement to YOLOL."""
+        if statement.kind == 'import_group':
+            return self.import_group(env, statement), None
+        elif statement.kind == 'export':
+            return self.export(env, statement), None
+        elif statement.kind.startswith('let'): # type: ignore
+            return self.let(env, statement)
+        elif statement.kind.startswith('def'): # type: ignore
+            return self.define(env, statement), None
+        elif statement.kind == 'using':
+            return self.using(env, statement), None
+        elif statement.kind == 'comment':
+            return env, None
+        else:
+            raise AssertionError('unexpected statement kind: {}'.format(statement.kind))
+
     @context(statement='group')
     def import_group(self, env: Env, group: Node) -> Env:
         """Transpile an import group to YOLOL."""
@@ -92,16 +129,20 @@ class Transpiler:
         logger.debug('transpiling let statement - {}'.format(let))
         ident = let.children[0].value
         expr = let.children[1]
+        self._temps = []
+        # The value is assigned to variables anyway, so it is only checked against the budget, not materialized
         if let.kind == 'let_num':
-            env, value = self.nexpr(env, expr)
+            env, value = self._nexpr(env, expr)
         elif let.kind == 'let_vec':
-            env, value = self.vexpr(env, expr)
+            env, value = self._vexpr(env, expr)
         elif let.kind == 'let_mat':
-            env, value = self.mexpr(env, expr)
+            env, value = self._mexpr(env, expr)
         else:
             raise AssertionError('unexpected let kind: {}'.format(let.kind))
+        if self.budget_mode == 'abort':
+            env, value = self.limit(env, expr, value)
         env, assignments = env.let(ident, value)
-        line = Node(kind='line', children=assignments)
+        line = Node(kind='line', children=[*self._temps, *assignments])
         return env, line
 
     @context(statement='definition')
@@ -134,8 +175,40 @@ class Transpiler:
             env = self.define(env, def_)
         return env
 
-    @context(expression='nexpr')
+    def expand(self, env: Env, call: Node, macro: Macro, transpile: Callable[[Env, Node], Tuple[Env, Any]]) -> Tuple[Env, Any]:
+        """Expand a macro call, then transpile the expansion."""
+        args = call.children[1].children
+        if self.profiler is None:
+            return transpile(env, macro.call(args))
+        self.profiler.begin_call(call.children[0].value)
+        begin = perf_counter()
+        env, value = transpile(env, macro.call(args))
+        self.profiler.end_call(perf_counter() - begin, value)
+        return env, value
+
+    def limit(self, env: Env, expr: Node, value: Any) -> Tuple[Env, Any]:
+        """Keep the value of an expression within the budget.
+
+        A value with more nodes than the budget is assigned to temporary variables,
+        which are added before the assignments of the current statement.
+        """
+        if self.budget is None or value.size <= self.budget:
+            return env, value
+        if self.budget_mode == 'abort':
+            Context.expression = expr
+            raise YovecError('expression has {} nodes, which exceeds the budget of {}'.format(value.size, self.budget))
+        logger.debug('materializing expression - {}'.format(expr))
+        env, assignments, value = env.temp(value)
+        self._temps.extend(assignments)
+        return env, value
+
     def nexpr(self, env: Env, nexpr: Node) -> Tuple[Env, Number]:
+        """Transpile a number expression to YOLOL, keeping it within the budget."""
+        env, num = self._nexpr(env, nexpr)
+        return self.limit(env, nexpr, num)
+
+    @context(expression='nexpr')
+    def _nexpr(self, env: Env, nexpr: Node) -> Tuple[Env, Number]:
         """Transpile a number expression to YOLOL."""
         logger.debug('transpiling number expression - {}'.format(nexpr))
 
@@ -213,8 +286,7 @@ class Transpiler:
             macro = env.macro(ident)
             if macro.return_type != 'number':
                 raise YovecError('expected macro to return number expression, but got {} expression'.format(macro.return_type))
-            args = nexpr.children[1].children
-            return self.nexpr(env, macro.call(args))
+            return self.expand(env, nexpr, macro, self.nexpr)
 
         elif nexpr.kind == 'number':
             try:
@@ -225,8 +297,13 @@ class Transpiler:
         else:
             raise AssertionError('nexpr fallthough: {}'.format(nexpr))
 
-    @context(expression='vexpr')
     def vexpr(self, env: Env, vexpr: Node) -> Tuple[Env, Vector]:
+        """Transpile a vector expression to YOLOL, keeping it within the budget."""
+        env, vec = self._vexpr(env, vexpr)
+        return self.limit(env, vexpr, vec)
+
+    @context(expression='vexpr')
+    def _vexpr(self, env: Env, vexpr: Node) -> Tuple[Env, Vector]:
         """Transpile a vector expression to YOLOL."""
         logger.debug('transpiling vector expression - {}'.format(vexpr))
 
@@ -306,8 +383,7 @@ class Transpiler:
             macro = env.macro(ident)
             if macro.return_type != 'vector':
                 raise YovecError('expected macro to return vector expression, but got {} expression'.format(macro.return_type))
-            args = vexpr.children[1].children
-            return self.vexpr(env, macro.call(args))
+            return self.expand(env, vexpr, macro, self.vexpr)
 
         elif vexpr.kind == 'vector':
             numums = []
@@ -319,8 +395,13 @@ class Transpiler:
         else:
             raise AssertionError('vexpr fallthough: {}'.format(vexpr))
 
-    @context(expression='mexpr')
     def mexpr(self, env: Env, mexpr: Node) -> Tuple[Env, Matrix]:
+        """Transpile a matrix expression to YOLOL, keeping it within the budget."""
+        env, mat = self._mexpr(env, mexpr)
+        return self.limit(env, mexpr, mat)
+
+    @context(expression='mexpr')
+    def _mexpr(self, env: Env, mexpr: Node) -> Tuple[Env, Matrix]:
         """Transpile a matrix expression to YOLOL."""
         logger.debug('transpiling matrix expression - {}'.format(mexpr))
 
@@ -382,8 +463,7 @@ class Transpiler:
             macro= env.macro(ident)
             if macro.return_type != 'matrix':
                 raise YovecError('expected macro to return matrix expression, but got {} expression'.format(macro.return_type))
-            args = mexpr.children[1].children
-            return self.mexpr(env, macro.call(args))
+            return self.expand(env, mexpr, macro, self.mexpr)
 
         elif mexpr.kind == 'matrix':
             vecs = []
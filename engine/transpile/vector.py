@@ -1,31 +1,63 @@
 from copy import deepcopy
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
 
 from engine.errors import YovecError
 from engine.node import Node
 
+from engine.transpile.constant import Folding, fold_binary, fold_dot
 from engine.transpile.number import Number
 
 
 class Vector:
     PREFIX = '_yovec_vec'
 
-    """Represents a list of numbers."""
+    """Represents a list of numbers.
+
+    A vector may be a view of some elements of a backing list, which is only copied when the
+    elements are needed as a list.
+    """
     def __init__(self, nums: List[Number]):
         assert len(nums) > 0
-        self.nums = nums
+        self._data = nums
+        self._index = range(len(nums)) # type: Sequence[int]
         self.length = len(nums)
 
+    @classmethod
+    def view(cls, data: List[Number], index: Sequence[int]) -> 'Vector':
+        """Create a vector from the elements of a backing list at some indices, without copying them."""
+        assert len(index) > 0
+        vec = cls.__new__(cls)
+        vec._data = data
+        vec._index = index
+        vec.length = len(index)
+        return vec
+
     @property
     def class_name(self):
         return 'vector'
 
+    @property
+    def nums(self) -> List[Number]:
+        """Return the elements of the vector as a list."""
+        if self._index != range(len(self._data)):
+            self._data = [self._data[i] for i in self._index]
+            self._index = range(len(self._data))
+        return self._data
+
+    @property
+    def size(self) -> int:
+        """Return the number of nodes in the largest element expression."""
+        return max(self._data[i].size for i in self._index)
+
     # Operations
 
     def vecbinary(self, op: str, other: 'Vector') -> 'Vector':
         """Apply a binary operation to two vectors."""
         if self.length != other.length:
             raise YovecError('cannot apply operation {} to vectors of different lengths'.format(op))
+        folded = fold_binary(op.strip('vec_'), self.nums, other.nums)
+        if folded is not None:
+            return Vector(folded)
         return Vector([n.binary(op.strip('vec_'), other.nums[i]) for i, n in enumerate(self.nums)])
 
     def map(self, op: str) -> 'Vector':
@@ -34,31 +66,66 @@ class Vector:
 
     def premap(self, op: str, other: Number) -> 'Vector':
         """Premap a binary operation to a vector."""
+        folded = fold_binary(op, self.nums, [other] * self.length)
+        if folded is not None:
+            return Vector(folded)
         return Vector([n.binary(op, other) for n in self.nums])
 
     def postmap(self, other: Number, op: str) -> 'Vector':
         """Postmap a binary operation to a vector."""
+        folded = fold_binary(op, [other] * self.length, self.nums)
+        if folded is not None:
+            return Vector(folded)
         return Vector([other.binary(op, n) for n in self.nums])
 
     def apply(self, op: str, other: 'Vector') -> 'Vector':
         """Apply a binary operation to two vectors."""
         if self.length != other.length:
             raise YovecError('cannot apply operation {} to vectors of different lengths'.format(op))
+        folded = fold_binary(op, self.nums, other.nums)
+        if folded is not None:
+            return Vector(folded)
         return Vector([ln.binary(op, rn) for ln, rn in zip(self.nums, other.nums)])
 
     def concat(self, other: 'Vector') -> 'Vector':
         """Concatenate two vectors."""
+        if self._data is other._data:
+            return Vector.view(self._data, [*self._index, *other._index])
         return Vector([*self.nums, *other.nums])
 
     def reverse(self) -> 'Vector':
         """Reverse a vector."""
-        return Vector(list(self.nums[::-1]))
+        return Vector.view(self._data, self._index[::-1])
 
     def dot(self, other: 'Vector') -> Number:
-        """Calculate the dot product of two vectors."""
-        n = Number(0)
+        """Calculate the dot product of two vectors.
+
+        Literal zeros and ones are skipped only while folding, since skipping them is a reduction.
+        """
+        if self.length == other.length:
+            folded = fold_dot(self.nums, other.nums)
+            if folded is not None:
+                return folded
+        if not Folding.enabled:
+            n = Number(0)
+            for ln, rn in zip(self.nums, other.nums):
+                n = n.binary('add', ln.binary('mul', rn))
+            return n
+        terms = []
         for ln, rn in zip(self.nums, other.nums):
-            n = n.binary('add', ln.binary('mul', rn))
+            if ln.is_literal(0) or rn.is_literal(0):
+                continue
+            elif ln.is_literal(1):
+                terms.append(rn)
+            elif rn.is_literal(1):
+                terms.append(ln)
+            else:
+                terms.append(ln.binary('mul', rn))
+        if len(terms) == 0:
+            return Number(0)
+        n = terms[0]
+        for term in terms[1:]:
+            n = n.binary('add', term)
         return n
 
     def len(self) -> Number:
@@ -75,7 +142,7 @@ class Vector:
     def elem(self, index: int) -> Number:
         """Get a vector element by index."""
         try:
-            return self.nums[index]
+            return self._data[self._index[index]]
         except IndexError:
             raise YovecError('element index {} is out of range'.format(index))
 
@@ -0,0 +1,220 @@
+from argparse import ArgumentParser
+from pathlib import Path
+from platform import python_version
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import sys
+import tracemalloc
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from engine.context import Context
+from engine.node import Node
+from engine.run import make_parser
+from engine.version import VERSION
+
+from engine.format.cylon import iter_compact_cylon, iter_cylon
+from engine.format.flat import iter_flat
+from engine.format.text import iter_text
+
+from engine.optimize.elim import eliminate_dead_code
+from engine.optimize.mangle import mangle_names
+from engine.optimize.reduce import reduce_expressions
+from engine.optimize.split import split_assignments
+
+from engine.transpile.resolve import resolve_aliases
+from engine.transpile.transpiler import Transpiler
+
+
+def name(i: int) -> str:
+    """Make a variable name, since variable names cannot contain digits."""
+    letters = ''
+    while True:
+        letters = chr(ord('A') + i % 26) + letters
+        i = i // 26 - 1
+        if i < 0:
+            return letters
+
+
+def let_chain(size: int, root: Path) -> str:
+    lines = ['import x', 'let number {} = $x'.format(name(0))]
+    for i in range(1, size):
+        lines.append('let number {} = {} * 2 + $x'.format(name(i), name(i - 1)))
+    lines.append('export {}'.format(name(size - 1)))
+    return '\n'.join(lines)
+
+
+def wide_vector(size: int, root: Path) -> str:
+    elements = ', '.join('$x * {} + {}'.format(i, i % 3) for i in range(size))
+    return '\n'.join([
+        'import x',
+        'let vector V = [{}]'.format(elements),
+        'let vector W = (map *2 V) + (reverse V)',
+        'let number N = W dot V',
+        'export W',
+        'export N'
+    ])
+
+
+def matmul(size: int, root: Path) -> str:
+    def matrix(offset: int) -> str:
+        rows = ('[{}]'.format(', '.join('$x + {}'.format((r * size + c + offset) % 5) for c in range(size)))
+            for r in range(size))
+        return '[{}]'.format(', '.join(rows))
+    return '\n'.join([
+        'import x',
+        'let matrix A = {}'.format(matrix(0)),
+        'let matrix B = {}'.format(matrix(1)),
+        'let matrix C = A @ B',
+        'export C'
+    ])
+
+
+def macro_nesting(size: int, root: Path) -> str:
+    lines = ['import x', 'define f0(number A) -> number = A + 1']
+    for i in range(1, size):
+        lines.append('define f{}(number A) -> number = f{}!(A) * 2'.format(i, i - 1))
+    lines.extend(['let number R = f{}!($x)'.format(size - 1), 'export R'])
+    return '\n'.join(lines)
+
+
+def heavy_using(size: int, root: Path) -> str:
+    lines = ['import x']
+    for i in range(size):
+        with open(str(root / 'bench{}.lib.yovec'.format(i)), 'w') as f:
+            f.write('define g{0}(number A) -> number = A * {0} + 1\n'.format(i))
+            f.write('define h{0}(vector V) -> number = reduce + (map *{0} V)\n'.format(i))
+        lines.append('using bench{}'.format(i))
+    for i in range(size):
+        lines.append('let number {} = g{}!($x) + h{}!([$x, 1, 2])'.format(name(i), i, i))
+        lines.append('export {}'.format(name(i)))
+    return '\n'.join(lines)
+
+
+WORKLOADS = {
+    'let_chain': (let_chain, (25, 50, 100)),
+    'wide_vector': (wide_vector, (10, 25, 50)),
+    'matmul': (matmul, (2, 3, 4)),
+    'macro_nesting': (macro_nesting, (10, 20, 30)),
+    'heavy_using': (heavy_using, (5, 10, 20))
+}
+
+# Stages faster than this are too noisy to compare
+MIN_SECONDS = 0.005
+
+STAGES = ('parse', 'transpile', 'resolve', 'reduce', 'elim', 'mangle', 'split', 'text', 'cylon', 'compact_cylon', 'flat', 'ast')
+
+
+def run_stages(source: str, root: Path, measure):
+    """Run each stage of Yovec, measuring it with a function of the stage name and a thunk."""
+    Context.reset()
+    parser = make_parser()
+    tree = measure('parse', lambda: Node.from_tree(parser.parse(source)))
+    env, yolol = measure('transpile', lambda: Transpiler(parser, root).program(tree))
+    yolol, imported, exported = measure('resolve', lambda: resolve_aliases(env, yolol))
+    yolol = measure('reduce', lambda: reduce_expressions(yolol))
+    yolol = measure('elim', lambda: eliminate_dead_code(yolol, exported))
+    yolol = measure('mangle', lambda: mangle_names(yolol, imported, exported))
+    yolol = measure('split', lambda: split_assignments(yolol, imported, exported, mangled=True))
+    text = measure('text', lambda: ''.join(iter_text(yolol)))
+    measure('cylon', lambda: ''.join(iter_cylon(yolol)))
+    measure('compact_cylon', lambda: ''.join(iter_compact_cylon(yolol)))
+    measure('flat', lambda: ''.join(iter_flat(yolol)))
+    measure('ast', lambda: yolol.pretty())
+    return text
+
+
+def bench(source: str, root: Path, repeat: int):
+    """Time each stage, keeping the fastest of several runs, then measure peak memory in a separate run."""
+    seconds = {stage: float('inf') for stage in STAGES}
+    peaks = {}
+
+    def time(stage, thunk):
+        start = perf_counter()
+        result = thunk()
+        seconds[stage] = min(seconds[stage], perf_counter() - start)
+        return result
+
+    def trace(stage, thunk):
+        tracemalloc.start()
+        try:
+            result = thunk()
+            peaks[stage] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result
+
+    for _ in range(repeat):
+        text = run_stages(source, root, time)
+    run_stages(source, root, trace)
+    stages = {stage: {'seconds': seconds[stage], 'peak_bytes': peaks[stage]} for stage in STAGES}
+    return stages, text
+
+
+def compare(results, baseline, threshold: float) -> int:
+    """Print the ratio of each stage to a baseline, returning the number of regressions."""
+    old = {(r['workload'], r['size']): r['stages'] for r in baseline['results']}
+    regressions = 0
+    for result in results:
+        key = (result['workload'], result['size'])
+        if key not in old:
+            continue
+        for stage in STAGES:
+            if stage not in old[key] or old[key][stage]['seconds'] < MIN_SECONDS:
+                continue
+            ratio = result['stages'][stage]['seconds'] / old[key][stage]['seconds']
+            if ratio > threshold:
+                regressions += 1
+                print('Regression: {} size {} {}: {:.2f}x slower'.format(key[0], key[1], stage, ratio))
+    return regressions
+
+
+parser = ArgumentParser(description='Benchmark each stage of Yovec on synthetic workloads')
+parser.add_argument('--workload', action='append', choices=sorted(WORKLOADS), help='workloads to run (default: all)')
+parser.add_argument('--scale', type=float, default=1, help='multiply every workload size (default: 1)')
+parser.add_argument('--repeat', type=int, default=3, help='runs per workload, keeping the fastest (default: 3)')
+parser.add_argument('--output', default='bench.json', help='JSON results file (default: bench.json)')
+parser.add_argument('--compare', metavar='BASELINE', help='JSON results file to compare against')
+parser.add_argument('--threshold', type=float, default=1.25,
+        help='slowdown ratio reported as a regression (default: 1.25)')
+args = parser.parse_args()
+
+results = []
+with TemporaryDirectory() as directory:
+    root = Path(directory)
+    for workload in args.workload or sorted(WORKLOADS):
+        generate, sizes = WORKLOADS[workload]
+        for size in sizes:
+            size = max(1, int(size * args.scale))
+            source = generate(size, root)
+            stages, text = bench(source, root, args.repeat)
+            results.append({
+                'workload': workload,
+                'size': size,
+                'source_characters': len(source),
+                'yolol_lines': len(text.splitlines()),
+                'yolol_characters': len(text),
+                'stages': stages
+            })
+            slowest = sorted(STAGES, key=lambda stage: stages[stage]['seconds'], reverse=True)[:3]
+            print('{:<14} {:>4}  {:>8.3f}s  {:>6.1f} MiB peak  ({})'.format(
+                workload,
+                size,
+                sum(s['seconds'] for s in stages.values()),
+                max(s['peak_bytes'] for s in stages.values()) / 2**20,
+                ', '.join('{} {:.3f}s'.format(stage, stages[stage]['seconds']) for stage in slowest)
+            ))
+
+with open(args.output, 'w') as f:
+    json.dump({'version': VERSION, 'python': python_version(), 'results': results}, f, indent=4)
+print('Saved results to {}'.format(args.output))
+
+if args.compare is not None:
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    print('{} regressions against {}'.format(regressions, args.compare))
+    exit(1 if regressions > 0 else 0)
+exit(0)
@@ -0,0 +1,283 @@
+from argparse import ArgumentParser
+from itertools import product
+from math import isclose, isnan
+from pathlib import Path
+import random
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from engine.context import Context
+from engine.errors import YovecError
+from engine.interpreter import parse_yolol, run_yolol
+from engine.node import Node
+from engine.run import make_parser, run_yovec
+from engine.transpile.resolve import resolve_aliases
+from engine.transpile.transpiler import Transpiler
+
+
+OPTIMIZATIONS = ('no_reduce', 'no_elim', 'no_mangle')
+
+UNARY_OPS = ('neg', 'not', 'abs', 'sqrt', 'sin', 'cos', 'tan', 'arcsin', 'arccos', 'arctan')
+BINARY_OPS = ('+', '-', '*', '/', '%', '^', '<', '<=', '>', '>=', '==', '!=', 'and', 'or')
+
+
+class Generator:
+    """Generate random, well-typed Yovec programs."""
+    def __init__(self, rng: random.Random, depth: int=3):
+        self.rng = rng
+        self.depth = depth
+        self.externals = ['x{}'.format(i) for i in range(rng.randint(1, 4))]
+        self.numbers = []
+        self.vectors = {}
+        self.matrices = {}
+        self.count = 0
+
+    def program(self, statements: int) -> str:
+        lines = ['import {}'.format(', '.join(self.externals))]
+        for _ in range(statements):
+            lines.append(self.let())
+        names = self.numbers + list(self.vectors) + list(self.matrices)
+        for name in self.rng.sample(names, self.rng.randint(1, len(names))):
+            lines.append('export {}'.format(name))
+        return '\n'.join(lines) + '\n'
+
+    def name(self) -> str:
+        n = self.count
+        self.count += 1
+        letters = ''
+        while True:
+            letters = chr(ord('A') + n % 26) + letters
+            n = n // 26 - 1
+            if n < 0:
+                return 'V_' + letters
+
+    def let(self) -> str:
+        name = self.name()
+        kind = self.rng.choice(('number', 'number', 'vector', 'matrix'))
+        if kind == 'number':
+            line = 'let number {} = {}'.format(name, self.nexpr(self.depth))
+            self.numbers.append(name)
+        elif kind == 'vector':
+            size = self.rng.randint(1, 4)
+            line = 'let vector {} = {}'.format(name, self.vexpr(self.depth, size))
+            self.vectors[name] = size
+        else:
+            shape = (self.rng.randint(1, 3), self.rng.randint(1, 3))
+            line = 'let matrix {} = {}'.format(name, self.mexpr(self.depth, shape))
+            self.matrices[name] = shape
+        return line
+
+    def literal(self) -> str:
+        if self.rng.random() < 0.7:
+            return str(self.rng.randint(-5, 9))
+        return '{:.2f}'.format(self.rng.uniform(-10, 10))
+
+    def nexpr(self, depth: int) -> str:
+        choices = ['literal', 'external']
+        if len(self.numbers) > 0:
+            choices.append('variable')
+        if depth > 0:
+            choices.extend(('unary', 'binary', 'binary', 'reduce', 'dot', 'len', 'elem'))
+            if len(self.matrices) > 0:
+                choices.extend(('mat_elem', 'rows'))
+        choice = self.rng.choice(choices)
+        if choice == 'literal':
+            return self.literal()
+        elif choice == 'external':
+            return '${}'.format(self.rng.choice(self.externals))
+        elif choice == 'variable':
+            return self.rng.choice(self.numbers)
+        elif choice == 'unary':
+            return '{} ({})'.format(self.rng.choice(UNARY_OPS), self.nexpr(depth - 1))
+        elif choice == 'binary':
+            return '({}) {} ({})'.format(self.nexpr(depth - 1), self.rng.choice(BINARY_OPS), self.nexpr(depth - 1))
+        elif choice == 'reduce':
+            return 'reduce {} ({})'.format(self.rng.choice(('+', '*')), self.vexpr(depth - 1, self.rng.randint(1, 4)))
+        elif choice == 'dot':
+            size = self.rng.randint(1, 4)
+            return '({}) dot ({})'.format(self.vexpr(depth - 1, size), self.vexpr(depth - 1, size))
+        elif choice == 'len':
+            return 'len ({})'.format(self.vexpr(depth - 1, self.rng.randint(1, 4)))
+        elif choice == 'elem':
+            size = self.rng.randint(1, 4)
+            return 'elem ({}) {}'.format(self.vexpr(depth - 1, size), self.rng.randrange(size))
+        elif choice == 'mat_elem':
+            name, (rows, cols) = self.rng.choice(list(self.matrices.items()))
+            return 'elem {} {} {}'.format(name, self.rng.randrange(rows), self.rng.randrange(cols))
+        else:
+            return 'rows {}'.format(self.rng.choice(list(self.matrices)))
+
+    def vexpr(self, depth: int, size: int) -> str:
+        choices = ['vector']
+        if size in self.vectors.values():
+            choices.append('variable')
+        if depth > 0:
+            choices.extend(('binary', 'map', 'premap', 'postmap', 'apply', 'reverse'))
+            if size > 1:
+                choices.append('concat')
+            if any(rows == size for rows, _ in self.matrices.values()):
+                choices.append('col')
+        choice = self.rng.choice(choices)
+        if choice == 'vector':
+            return '[{}]'.format(', '.join(self.nexpr(depth - 1) for _ in range(size)))
+        elif choice == 'variable':
+            return self.rng.choice([name for name, s in self.vectors.items() if s == size])
+        elif choice == 'binary':
+            return '({}) {} ({})'.format(self.vexpr(depth - 1, size), self.rng.choice(('+', '-')), self.vexpr(depth - 1, size))
+        elif choice == 'map':
+            return 'map {} ({})'.format(self.rng.choice(UNARY_OPS), self.vexpr(depth - 1, size))
+        elif choice == 'premap':
+            return 'map {} ({}) ({})'.format(self.rng.choice(BINARY_OPS), self.nexpr(depth - 1), self.vexpr(depth - 1, size))
+        elif choice == 'postmap':
+            return 'map ({}) {} ({})'.format(self.nexpr(depth - 1), self.rng.choice(BINARY_OPS), self.vexpr(depth - 1, size))
+        elif choice == 'apply':
+            return 'apply {} ({}) ({})'.format(self.rng.choice(BINARY_OPS), self.vexpr(depth - 1, size), self.vexpr(depth - 1, size))
+        elif choice == 'reverse':
+            return 'reverse ({})'.format(self.vexpr(depth - 1, size))
+        elif choice == 'concat':
+            left = self.rng.randint(1, size - 1)
+            return 'concat ({}) ({})'.format(self.vexpr(depth - 1, left), self.vexpr(depth - 1, size - left))
+        else:
+            name, (_, cols) = self.rng.choice([(n, s) for n, s in self.matrices.items() if s[0] == size])
+            return 'col {} {}'.format(name, self.rng.randrange(cols))
+
+    def mexpr(self, depth: int, shape: tuple) -> str:
+        rows, cols = shape
+        choices = ['matrix']
+        if shape in self.matrices.values():
+            choices.append('variable')
+        if depth > 0:
+            choices.extend(('binary', 'map', 'transpose', 'mul'))
+        choice = self.rng.choice(choices)
+        if choice == 'matrix':
+            return '[{}]'.format(', '.join(self.vexpr(depth - 1, cols) for _ in range(rows)))
+        elif choice == 'variable':
+            return self.rng.choice([name for name, s in self.matrices.items() if s == shape])
+        elif choice == 'binary':
+            return '({}) {} ({})'.format(self.mexpr(depth - 1, shape), self.rng.choice(('+', '-')), self.mexpr(depth - 1, shape))
+        elif choice == 'map':
+            return 'map {} ({})'.format(self.rng.choice(UNARY_OPS), self.mexpr(depth - 1, shape))
+        elif choice == 'transpose':
+            return 'transpose ({})'.format(self.mexpr(depth - 1, (cols, rows)))
+        else:
+            inner = self.rng.randint(1, 3)
+            return '({}) @ ({})'.format(self.mexpr(depth - 1, (rows, inner)), self.mexpr(depth - 1, (inner, cols)))
+
+
+def interface(source: str):
+    """Get the imported and exported YOLOL names of a program."""
+    Context.reset()
+    parser = make_parser()
+    yovec = Node.from_tree(parser.parse(source))
+    env, yolol = Transpiler(parser, ROOT).program(yovec)
+    _, imported, exported = resolve_aliases(env, yolol)
+    return sorted(imported), sorted(exported)
+
+
+def compile_variants(source: str):
+    """Transpile a program with every combination of optimizations."""
+    variants = []
+    for flags in product((True, False), repeat=len(OPTIMIZATIONS)):
+        variant = dict(zip(OPTIMIZATIONS, flags))
+        try:
+            program = parse_yolol(run_yovec(source, root=ROOT, **variant), check_length=False)
+        except YovecError as e:
+            program = e
+        variants.append((variant, program))
+    return variants
+
+
+def execute(program: Node, externals):
+    """Execute a program for a single pass, returning None on runtime errors."""
+    execution = run_yolol(program, max(1, len(program.children)), externals=externals)
+    if execution.errors > 0:
+        return None
+    return execution.variables
+
+
+def same(a: float, b: float, tolerance: float) -> bool:
+    if isnan(a) or isnan(b):
+        return isnan(a) and isnan(b)
+    return a == b or isclose(a, b, rel_tol=tolerance, abs_tol=tolerance)
+
+
+def check(name: str, source: str, rng: random.Random, trials: int, tolerance: float):
+    """Check that every combination of optimizations preserves the exported values of a program.
+
+    The first variant, with every optimization disabled, is the baseline.
+    A trial is skipped only if the baseline hits a runtime error. Otherwise, a variant that fails
+    to compile or hits a runtime error is a mismatch, since reduction may only report constant
+    errors at compile time that the baseline would hit at runtime.
+    Returns the number of compared and skipped runs, and a list of mismatches.
+    """
+    try:
+        imported, exported = interface(source)
+    except Exception:
+        return 0, trials, []
+    (_, baseline), *variants = compile_variants(source)
+    if isinstance(baseline, YovecError):
+        return 0, trials, []
+    compared = 0
+    skipped = 0
+    failures = []
+    for _ in range(trials):
+        externals = {name: round(rng.uniform(-10, 10), rng.choice((0, 2, 4))) for name in imported}
+        expected = execute(baseline, externals)
+        if expected is None:
+            skipped += 1
+            continue
+        for variant, program in variants:
+            compared += 1
+            if isinstance(program, YovecError):
+                failures.append((name, variant, externals, 'failed to compile: {}'.format(str(program).splitlines()[0])))
+                continue
+            actual = execute(program, externals)
+            if actual is None:
+                failures.append((name, variant, externals, 'runtime error, but the baseline has none'))
+                continue
+            for var in exported:
+                if not same(expected.get(var, 0.0), actual.get(var, 0.0), tolerance):
+                    failures.append((name, variant, externals, '{}: expected {}, but got {}'.format(
+                        var, expected.get(var, 0.0), actual.get(var, 0.0))))
+                    break
+    return compared, skipped, failures
+
+
+def describe(variant) -> str:
+    disabled = ['--' + flag.replace('_', '-') for flag in OPTIMIZATIONS if variant[flag]]
+    return ' '.join(disabled) if len(disabled) > 0 else 'all optimizations'
+
+
+parser = ArgumentParser(description='Check that optimizations preserve the exported values of programs')
+parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+parser.add_argument('--count', type=int, default=20, help='number of random programs (default: 20)')
+parser.add_argument('--statements', type=int, default=6, help='let statements per random program (default: 6)')
+parser.add_argument('--trials', type=int, default=5, help='random inputs per program (default: 5)')
+parser.add_argument('--tolerance', type=float, default=1e-4, help='tolerance of compared values (default: 1e-4)')
+args = parser.parse_args()
+
+rng = random.Random(args.seed)
+cases = [(str(p), p.read_text()) for p in sorted((ROOT / 'programs').glob('*.yovec'))]
+for i in range(args.count):
+    cases.append(('random program {} (seed {})'.format(i, args.seed), Generator(rng).program(args.statements)))
+
+compared = 0
+skipped = 0
+failures = []
+sources = dict(cases)
+for name, source in cases:
+    c, s, f = check(name, source, rng, args.trials, args.tolerance)
+    compared += c
+    skipped += s
+    failures.extend(f)
+
+for name, variant, externals, message in failures:
+    print('Mismatch in {} with {}'.format(name, describe(variant)))
+    print('  externals: {}'.format(externals))
+    print('  {}'.format(message))
+    print('\n'.join('  | ' + line for line in sources[name].splitlines()))
+print('Compared {} runs of {} programs ({} skipped after runtime errors), {} mismatches'.format(
+    compared, len(cases), skipped, len(failures)))
+exit(1 if len(failures) > 0 else 0)
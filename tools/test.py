@@ -1,30 +1,138 @@
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
 from difflib import Differ
+from os import cpu_count
 from pathlib import Path
-import subprocess
-
-
-cases = [p.with_suffix('') for p in Path('programs').glob('*.yovec')]
-for case in cases:
-    yovec = case.with_suffix('.yovec')
-    yolol = case.with_suffix('.yolol')
-
-    if not yolol.exists():
-        print('Generating {} ...'.format(yolol))
-        result = subprocess.run(['python3', 'yovec.py', '-i', yovec, '-o', yolol])
-        if result.returncode != 0:
-            exit(1)
-
-    print('Testing {} ...'.format(yovec))
-    result = subprocess.run(['python3', 'yovec.py', '-i', yovec], stdout=subprocess.PIPE)
-    if result.returncode != 0:
-        exit(1)
-    output = result.stdout.decode('utf-8').strip()
-    with open(yolol) as f:
-        expected = f.read().strip()
-    if output != expected:
-        print('Test failed: output was different than expected\n')
-        diff = list(Differ().compare(expected.splitlines(), output.splitlines()))
-        print('\n'.join(diff))
-        exit(1)
-
-exit(0)
+from time import perf_counter
+from typing import Any, Dict, Optional
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from engine.errors import YovecError
+from engine.run import make_parser, run_yovec
+from engine.transpile.incremental import Snapshots
+
+
+# Options of cases that are not transpiled with the defaults, by file name
+CASE_OPTIONS = {
+    'budget.yovec': {'budget': 4}
+} # type: Dict[str, Dict[str, Any]]
+
+
+def transpile(yovec: Path):
+    """Transpile a case, returning the output or error, the compile time, and any incremental mismatch."""
+    with open(str(yovec)) as f:
+        source = f.read()
+    options = CASE_OPTIONS.get(yovec.name, {})
+    # Build the parser before timing, once per process
+    make_parser()
+    start = perf_counter()
+    output, error = run(source, **options)
+    seconds = perf_counter() - start
+    return output, error, seconds, check_incremental(source, options) or check_budget(source, options)
+
+
+def run(source: str, snapshots: Optional[Snapshots]=None, **options: Any):
+    """Transpile a source, returning the output or error."""
+    try:
+        return run_yovec(source, root=ROOT, snapshots=snapshots, **options), None
+    except YovecError as e:
+        return None, str(e)
+
+
+def check_incremental(source: str, options: Dict[str, Any]) -> Optional[str]:
+    """Check that transpiling with snapshots gives the same result as transpiling from scratch.
+
+    Names are not mangled, so that differences in generated names are visible.
+    The source is transpiled with snapshots, then again with a statement inserted after its first let
+    statement, so that the second run restores a snapshot and transpiles more statements after it.
+    Returns a description of the first mismatch, if any.
+    """
+    lines = source.splitlines()
+    lets = [i for i, line in enumerate(lines) if line.startswith('let ')]
+    if len(lets) == 0:
+        return None
+    edited = '\n'.join([*lines[:lets[0] + 1], 'let number INCREMENTAL = 1', *lines[lets[0] + 1:]])
+    options = dict(options, no_mangle=True)
+    snapshots = Snapshots()
+    if run(source, snapshots, **options) != run(source, **options):
+        return 'incremental result differs from fresh result'
+    if run(edited, snapshots, **options) != run(edited, **options):
+        return 'incremental result differs from fresh result after an inserted statement'
+    return None
+
+
+def check_budget(source: str, options: Dict[str, Any]) -> Optional[str]:
+    """Check a case that is transpiled with a budget.
+
+    The case must exceed its budget, so it must fail in abort mode. Snapshots taken without the
+    budget must not be restored with it, so the result with both must match a fresh result.
+    Returns a description of the first mismatch, if any.
+    """
+    if options.get('budget') is None:
+        return None
+    _, error = run(source, **dict(options, budget_mode='abort'))
+    if error is None or 'exceeds the budget' not in error:
+        return 'expected the budget to be exceeded in abort mode, but got: {}'.format(error)
+    snapshots = Snapshots()
+    run(source, snapshots, no_mangle=True)
+    if run(source, snapshots, no_mangle=True, **options) != run(source, no_mangle=True, **options):
+        return 'incremental result with a budget differs from fresh result'
+    return None
+
+
+def main():
+    parser = ArgumentParser(description='Test Yovec against the expected outputs of programs')
+    parser.add_argument('--update', action='store_true', help='overwrite expected outputs with actual outputs')
+    parser.add_argument('--jobs', type=int, default=cpu_count() or 1, help='number of worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    cases = sorted(p.relative_to(ROOT) for p in (ROOT / 'programs').glob('*.yovec'))
+    if args.jobs > 1 and len(cases) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(transpile, [ROOT / c for c in cases]))
+    else:
+        results = [transpile(ROOT / c) for c in cases]
+
+    passed = 0
+    failed = 0
+    generated = 0
+    for yovec, (output, error, seconds, mismatch) in zip(cases, results):
+        yolol = ROOT / yovec.with_suffix('.yolol')
+        if mismatch is not None:
+            print('Testing {} ... failed ({:.3f}s)\n\n{}\n'.format(yovec, seconds, mismatch))
+            failed += 1
+            continue
+        if error is not None:
+            print('Testing {} ... error ({:.3f}s)\n\n{}\n'.format(yovec, seconds, error))
+            failed += 1
+            continue
+        output = output.strip()
+        expected = None
+        if yolol.exists():
+            with open(str(yolol)) as f:
+                expected = f.read().strip()
+
+        if expected is None or (args.update and output != expected):
+            print('Generating {} ... ({:.3f}s)'.format(yovec.with_suffix('.yolol'), seconds))
+            with open(str(yolol), 'w') as f:
+                f.write(output + '\n')
+            generated += 1
+        elif output != expected:
+            print('Testing {} ... failed ({:.3f}s)\n'.format(yovec, seconds))
+            diff = list(Differ().compare(expected.splitlines(), output.splitlines()))
+            print('\n'.join(diff))
+            failed += 1
+        else:
+            print('Testing {} ... ok ({:.3f}s)'.format(yovec, seconds))
+            passed += 1
+
+    print('{} passed, {} failed, {} generated ({:.3f}s compile time)'.format(
+        passed, failed, generated, sum(seconds for _, _, seconds, _ in results)))
+    exit(1 if failed > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
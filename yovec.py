@@ -1,16 +1,50 @@
-from argparse import ArgumentParser, FileType
+from argparse import ArgumentParser, ArgumentTypeError, FileType
 from os.path import realpath, dirname
 from pathlib import Path
 from sys import stdin, stdout, stderr, exit
 
 
+def assignment(s):
+    name, _, value = s.partition('=')
+    try:
+        if name == '':
+            raise ValueError
+        return name, float(value)
+    except ValueError:
+        raise ArgumentTypeError('expected NAME=VALUE, but got {}'.format(s))
+
+
 parser = ArgumentParser(description='Transpile Yovec to YOLOL')
+parser.add_argument('inputs', nargs='*', metavar='PATTERN',
+        help='Yovec source files or globs to transpile in batch mode')
 parser.add_argument('-i', action='store', dest='infile', default=stdin,
         type=FileType('r'), help='Yovec source file (stdin if unset)')
 parser.add_argument('-o', action='store', dest='outfile', default=stdout,
         type=FileType('w'), help='YOLOL output file (stdout if unset)')
+parser.add_argument('--manifest', action='store', help='file listing inputs for batch mode, one per line')
+parser.add_argument('--outdir', action='store', help='output directory for batch mode')
+parser.add_argument('--jobs', action='store', type=int, default=1, metavar='N',
+        help='number of worker processes (default: 1)')
+parser.add_argument('--serve', action='store_true', help='serve JSON-lines transpile requests on stdin/stdout')
+parser.add_argument('--socket', action='store', metavar='PATH', help='serve JSON-lines transpile requests on a Unix socket')
+parser.add_argument('--cache', action='store', metavar='DIR', help='reuse outputs from an on-disk cache')
+parser.add_argument('--cache-size', action='store', type=int, default=64, metavar='MB',
+        help='maximum size of the output cache (default: 64)')
 parser.add_argument('--ast', action='store_true', help='output Yovec AST (overrides --cylon)')
+parser.add_argument('--flat-ast', action='store_true', help='output machine-readable flat AST (overrides --ast and --cylon)')
 parser.add_argument('--cylon', action='store_true', help='output Cylon JSON')
+parser.add_argument('--cylon-compact', action='store_true', help='output minified Cylon JSON')
+parser.add_argument('--run', action='store', type=int, metavar='TICKS',
+        help='execute the YOLOL output for a number of ticks and print the final variables')
+parser.add_argument('--set', action='append', type=assignment, default=[], metavar='NAME=VALUE',
+        help='set an external variable before executing (repeatable)')
+parser.add_argument('--stats', action='store_true', help='print per-stage timings and counters to stderr')
+parser.add_argument('--profile', action='store_true',
+        help='print the transpile cost of each statement and macro call site to stderr')
+parser.add_argument('--budget', action='store', type=int, metavar='N',
+        help='maximum nodes in an expression during transpilation (unlimited if unset)')
+parser.add_argument('--budget-mode', action='store', choices=('materialize', 'abort'), default='materialize',
+        help='assign expressions over budget to temporaries, or abort (default: materialize)')
 parser.add_argument('--debug', action='store_true', help='print debug messages')
 parser.add_argument('--no-elim', action='store_true', help='disable dead code elimination')
 parser.add_argument('--no-mangle', action='store_true', help='disable name mangling')
@@ -26,6 +60,71 @@ if args.version:
 from engine.log import setup_logger
 setup_logger(debug=args.debug)
 
+root = Path(dirname(realpath(__file__)))
+flags = {
+    'no_elim': args.no_elim,
+    'no_reduce': args.no_reduce,
+    'no_mangle': args.no_mangle,
+    'ast': args.ast,
+    'cylon': args.cylon or args.cylon_compact,
+    'compact': args.cylon_compact,
+    'flat': args.flat_ast,
+    'budget': args.budget,
+    'budget_mode': args.budget_mode
+}
+
+if args.jobs < 1:
+    parser.error('--jobs must be at least 1')
+if args.budget is not None and args.budget < 1:
+    parser.error('--budget must be at least 1')
+if args.run is not None:
+    if args.run < 0:
+        parser.error('--run must be at least 0')
+    if args.ast or args.flat_ast or args.cylon or args.cylon_compact:
+        parser.error('--run cannot be combined with --ast, --flat-ast or --cylon')
+
+cache = None
+if args.cache is not None:
+    from engine.cache import OutputCache
+    cache = OutputCache(args.cache, args.cache_size * 1024 * 1024, processes=args.jobs)
+
+if args.serve or args.socket is not None:
+    from engine.server import serve_socket, serve_stdio
+    try:
+        if args.socket is not None:
+            serve_socket(args.socket, root, cache=cache)
+        else:
+            serve_stdio(root, stdin, stdout, cache=cache)
+    except OSError as e:
+        stderr.write('Server error: {}\n'.format(str(e)))
+        exit(1)
+    except KeyboardInterrupt:
+        pass
+    exit(0)
+
+if len(args.inputs) > 0 or args.manifest is not None:
+    if args.run is not None or args.stats or args.profile:
+        parser.error('batch mode cannot be combined with --run, --stats or --profile')
+    if args.outdir is None:
+        parser.error('batch mode requires --outdir')
+    if args.infile is not stdin or args.outfile is not stdout:
+        parser.error('batch mode cannot be combined with -i or -o')
+
+    from engine.batch import expand_inputs, run_batch, summarize
+    from engine.errors import YovecError
+    try:
+        inputs = expand_inputs(args.inputs, manifest=args.manifest)
+        results = run_batch(inputs, Path(args.outdir), root, jobs=args.jobs, cache=cache, **flags)
+    except YovecError as e:
+        stderr.write('{}\n'.format(str(e)))
+        exit(1)
+
+    failed = [r for r in results if r.error is not None]
+    for r in failed:
+        stderr.write('{}: {}\n'.format(r.infile, r.error))
+    stderr.write('{}\n'.format(summarize(results)))
+    exit(1 if len(failed) > 0 else 0)
+
 try:
     source = args.infile.read()
 except IOError as e:
@@ -33,25 +132,42 @@ except IOError as e:
     exit(1)
 
 from engine.errors import YovecError
-from engine.run import run_yovec
+from engine.run import compile_yovec, stream_yovec
+stats = None
+profiler = None
 try:
-    output = run_yovec(
-        source,
-        root=Path(dirname(realpath(__file__))),
-        no_elim=args.no_elim,
-        no_reduce=args.no_reduce,
-        no_mangle=args.no_mangle,
-        ast=args.ast,
-        cylon=args.cylon
-    )
+    if args.stats or args.profile:
+        from engine.transpile.profile import Profiler
+        profiler = Profiler() if args.profile else None
+        compilation = compile_yovec(source, root=root, jobs=args.jobs, profiler=profiler, **flags)
+        chunks = iter([compilation.output])
+        stats = compilation.stats if args.stats else None
+    else:
+        chunks = stream_yovec(source, root=root, cache=cache, jobs=args.jobs, **flags)
 except YovecError as e:
     stderr.write('{}\n'.format(str(e)))
     exit(1)
 
+if args.run is not None:
+    from engine.interpreter import parse_yolol, report, run_yolol
+    try:
+        execution = run_yolol(parse_yolol(''.join(chunks)), args.run, externals=dict(args.set))
+    except YovecError as e:
+        stderr.write('Run error: {}\n'.format(str(e)))
+        exit(1)
+    chunks = iter([report(execution)])
+
 try:
-    args.outfile.write(output + '\n')
+    for chunk in chunks:
+        args.outfile.write(chunk)
+    args.outfile.write('\n')
 except IOError as e:
     stderr.write('Output error: {}\n'.format(str(e)))
     exit(1)
 
+if stats is not None:
+    stderr.write('{}\n'.format(stats.format()))
+if profiler is not None:
+    stderr.write('{}\n'.format(profiler.format()))
+
 exit(0)